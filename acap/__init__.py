@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Analysis routines for SpectraCyber scans used by the ClassicAnalysisProgram.
+
+The main classes can be imported from the package directly, e.g.
+
+    from acap import Night, SolarCalibration
+
+Importing the package does no work; matplotlib is only imported when
+SpectrumRenderer is first used.
+"""
+
+from acap.spectrum import Spectrum, parse_spectrum, scan_labels, scan_time
+from acap.cube import ScanCube
+from acap.noise import NoiseProfile
+from acap.solarcal import SolarCalibration
+from acap.pipeline import Night
+
+
+def __getattr__(name):
+    # The renderer pulls in matplotlib, so it is imported on first access
+    if name == 'SpectrumRenderer':
+        from acap.render import SpectrumRenderer
+        return SpectrumRenderer
+    raise AttributeError('module '+repr(__name__)+' has no attribute '+repr(name))
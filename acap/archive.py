@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Solar calibration and noise statistics of every night in the ClassicData
+archive, for comparing calibrations across a season.
+
+Every ClassicData/DATE/TARGET folder with a Raw Data folder is a night,
+including those in DATE.zip or DATE.tar.gz archives (holding either
+TARGET folders or a DATE folder).
+Nights are summarised by a pool of worker processes, each using the
+night's own scan manifest, scan cache and saved noise profile, so a
+second pass over the archive mostly reads cached data. The summaries are
+written as one trend table (CSV) and one plot.
+"""
+
+import os
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from acap.pipeline import Night
+from acap.solarcal import SolarCalibration
+from acap.flags import ScanFlagger
+from acap import sources
+
+TREND_NAME = 'Archive Solar calibration'  # Name of the trend table and plot in the ClassicData folder
+COLUMNS = ('date', 'target', 'scans', 'start', 'end', 'mean', 'median', 'std', 'noise_scans',
+           'mean_noise', 'noise_std', 'gain', 'y_factor', 'flagged_scans', 'saturated', 'rfi', 'error')
+
+
+def night_date(name):
+    '''
+    Date of a DD-MM-YYYY folder or archive name, or None for other folders.
+    '''
+    name = name.split('/')[0]
+    suffix = sources.archive_suffix(name)
+    if suffix is not None:
+        name = name[:-len(suffix)]
+    try:
+        return datetime.datetime.strptime(name, '%d-%m-%Y').date()
+    except ValueError:
+        return None
+
+
+def find_nights(root):
+    '''
+    (DATE, TARGET) of every night under root, in date order.
+    '''
+    nights = []
+    for name in sources.listdir(root, folders=True) + sources.listdir(root):
+        if night_date(name) is None or not sources.isdir(os.path.join(root, name)):
+            continue
+        date = name
+        folder = sources.archive_folder(os.path.join(root, name))
+        if folder != os.path.join(root, name):
+            # Archive of the DATE folder itself
+            date = name+'/'+os.path.basename(folder)
+        for target in sources.listdir(os.path.join(root, date), folders=True):
+            if sources.isdir(os.path.join(root, date, target, 'Raw Data')):
+                nights.append((date, target))
+    return sorted(nights, key=lambda night: (night_date(night[0]), night[1]))
+
+
+def summarise_night(task):
+    '''
+    Solar calibration and noise statistics of one (root, date, target,
+    lower, upper, flags, max_bytes) night over the data points lower:upper,
+    leaving out flagged data points when flags is set and reading the
+    scans in chunks within max_bytes when given. Errors are reported in the
+    row instead of stopping the whole archive.
+    '''
+    root, date, target, lower, upper, flags, max_bytes = task
+    row = dict.fromkeys(COLUMNS, '')
+    row.update({'date': date, 'target': target})
+    try:
+        night = Night(root, date, target)
+        night.refresh()
+        mean_noise = None
+        # Same data points as the console flags, so saved noise profiles are shared with it
+        flagger = ScanFlagger(lower, upper+1) if flags else None
+        if sources.isdir(night.noisepath) and sources.listdir(night.noisepath):
+            noiseprofile = night.noise_profile(flagger=ScanFlagger(lower, upper+1) if flags else None)
+            # The same data points as the console's mean noise, so gain and y_factor agree with it
+            mean_noise, mean_std = noiseprofile.window_stats(lower, upper)
+            mean_noise = float(mean_noise)
+            row.update({'noise_scans': noiseprofile.count, 'mean_noise': mean_noise, 'noise_std': float(mean_std)})
+        if len(night.files) == 0:
+            night.cache.flush()
+            row.update({'scans': 0})
+            return row
+        chunks = ((cube, mask) for first, cube, corrected, mask in night.chunks(max_bytes, flagger=flagger))
+        solarcal = SolarCalibration.from_chunks(chunks, lower, upper, mean_noise)
+        night.cache.flush()
+        if flagger is not None:
+            row.update({'flagged_scans': flagger.flagged_scans, 'saturated': flagger.saturated, 'rfi': flagger.rfi})
+        summary = solarcal.summary()
+        row.update({'scans': summary['scans'], 'start': str(solarcal.times[0]), 'end': str(solarcal.times[-1]),
+                    'mean': summary['mean'], 'median': summary['median'], 'std': summary['std']})
+        if mean_noise is not None:
+            row.update({'gain': summary['gain'], 'y_factor': float(np.mean(solarcal.y_factor))})
+    except (OSError, ValueError, KeyError) as e:
+        row['error'] = type(e).__name__+': '+str(e)
+    # A worker process summarises many nights, so their archives are not kept open
+    sources.close_archives()
+    return row
+
+
+def scan_archive(root, lower, upper, processes=None, flags=False, max_bytes=None):
+    '''
+    Summarise every night under root with a pool of processes, returning
+    one row (dict of COLUMNS) per night in date order. Each process reads
+    its night in chunks within max_bytes when given.
+    '''
+    tasks = [(root, date, target, lower, upper, flags, max_bytes) for date, target in find_nights(root)]
+    if processes == 1 or len(tasks) < 2:
+        return [summarise_night(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(summarise_night, tasks))
+
+
+def save_trends(rows, filepath):
+    with open(filepath, 'w') as f:
+        f.write(','.join(COLUMNS)+'\n')
+        for row in rows:
+            values = []
+            for key in COLUMNS:
+                value = row[key]
+                if isinstance(value, float):
+                    value = '%.6f' % value
+                values.append('"'+str(value).replace('"', "'")+'"' if ',' in str(value) else str(value))
+            f.write(','.join(values)+'\n')
+
+
+def plot_trends(rows, filepath, dpi=300, fmt='png'):
+    '''
+    Plot the mean intensity and mean noise of every night against its date,
+    one line per target.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    top, bottom = figure.subplots(2, 1, sharex=True)
+    for target in sorted(set(row['target'] for row in rows)):
+        done = [row for row in rows if row['target'] == target and row['mean'] != '']
+        if not done:
+            continue
+        dates = [night_date(row['date']) for row in done]
+        top.plot(dates, [row['mean'] for row in done], marker='o', label=target+' mean intensity')
+        noise = [(night_date(row['date']), row['mean_noise']) for row in done if row['mean_noise'] != '']
+        if noise:
+            bottom.plot([d for d, v in noise], [v for d, v in noise], marker='o', label=target+' mean noise')
+    top.set_ylabel('Mean intensity (Volts)')
+    bottom.set_ylabel('Mean noise (Volts)')
+    bottom.set_xlabel('Date')
+    for ax in (top, bottom):
+        ax.grid(True)
+        ax.tick_params(direction='in')
+        if ax.lines:
+            ax.legend(fontsize=8)
+    top.set_title('Solar calibration across the archive')
+    figure.autofmt_xdate()
+    figure.savefig(filepath+'.'+fmt, dpi=dpi, format=fmt)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel rendering of single spectra across a pool of worker processes.
+
+Each worker parses a scan, divides it by the noise profile, renders and
+saves its figure and writes the processed data, exactly as the serial loop
+in acap_3.py does. Plots are saved but never shown.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from acap.spectrum import Spectrum, scan_labels, parse_spectrum
+from acap.cache import ScanCache
+from acap.writers import write_text
+from acap.sources import open_file
+from acap.flags import flag_scans, masked
+
+# Set once per worker by init_worker, so the noise profile and x-axis are
+# not pickled with every scan
+_shared = {}
+
+
+def init_worker(xscale, noisedata, settings):
+    _shared['renderer'] = None
+    _shared['xscale'] = xscale
+    _shared['noisedata'] = noisedata
+    _shared['settings'] = settings
+    _shared['cache'] = None
+    if settings.get('cachepath') is not None:
+        # Stale entries are left for the parent to remove, and uses are not recorded
+        _shared['cache'] = ScanCache(settings['cachepath'], read_only=True)
+
+
+def render_scan(task):
+    '''
+    Process one (scan_no, filepath, shift) task, where shift moves the
+    x-axis by that scan's own velocity shift, and return (scan_no, filename,
+    header, corrected, parsed, flags), where parsed holds (header, data) when
+    the scan was not cached and flags the (saturated, rfi) masks when
+    settings has flags.
+    '''
+    scan_no, filepath, shift = task
+    xscale = _shared['xscale']
+    if shift:
+        xscale = xscale + shift
+    noisedata = _shared['noisedata']
+    settings = _shared['settings']
+    offset = settings['offset']
+    alphaValue = settings['alpha']
+
+    # Workers only read the cache; newly parsed scans are stored by the parent
+    parsed = None
+    cached = _shared['cache'].get(filepath) if _shared['cache'] is not None else None
+    if cached is None:
+        with open_file(filepath) as f:
+            header, data = parse_spectrum(f.read(), Spectrum.HEADER_LENGTH, Spectrum.DELIMITER)
+        parsed = (header, data)
+    else:
+        header, data = cached
+    title, filename = scan_labels(header, settings['target'], scan_no, settings['timezone'])
+
+    flags = None
+    mask = None
+    if settings.get('flags') is not None:
+        flags = flag_scans(data, *settings['flags'])
+        mask = flags[0] | flags[1]
+    if noisedata is not None:
+        corrected = masked(data/noisedata+offset-1, mask)
+    else:
+        corrected = None
+    # Save figures as high resolution .png files ~ 0.5 MB each file
+    if settings['savegraphs']:
+        # Each worker builds its figure once and reuses it for every scan it renders
+        if _shared['renderer'] is None:
+            from acap.render import SpectrumRenderer
+            # The noise profile stays on the unshifted axis it was measured on, as in every serial render
+            _shared['renderer'] = SpectrumRenderer(_shared['xscale'], settings['xticks'], settings['xlabel'],
+                                                   settings['ylabel'], data.shape[1], noisedata,
+                                                   offset, alphaValue, settings['dpi'], settings['format'])
+        _shared['renderer'].render(title, data, corrected, settings['plotpath']+filename, xscale)
+
+    if corrected is None:
+        corrected = masked(data, mask)
+    if settings['savefiles']:
+        write_text(settings['processedpath']+filename+'.txt', np.hstack([corrected, (xscale)]))
+    return scan_no, filename, header, corrected, parsed, flags
+
+
+def render_scans(filepaths, xscale, noisedata, settings, processes, cache=None, writers=(), shifts=None, flagger=None):
+    '''
+    Render all scans in filepaths with a pool of processes, yielding
+    (scan_no, filename) in scan order. Scan numbers start at 1 in the order
+    of filepaths, as in the serial loop.
+
+    Workers write the text output themselves when savefiles is set; the
+    corrected spectra are also passed to writers (e.g. per-night bundles)
+    in the parent process.
+
+    shifts optionally gives, per scan, the velocity shift relative to xscale.
+    With a ScanFlagger, workers flag each scan with its settings and the
+    masks are counted by the flagger.
+
+    settings holds target, timezone, offset, alpha, xticks, xlabel, ylabel,
+    savegraphs, savefiles, plotpath, processedpath, cachepath, dpi and format.
+    '''
+    if shifts is None:
+        shifts = [0]*len(filepaths)
+    if flagger is not None:
+        settings = dict(settings, flags=flagger.settings)
+    tasks = [(scan_no, filepath, float(shift)) for scan_no, (filepath, shift) in enumerate(zip(filepaths, shifts), start=1)]
+    chunksize = max(1, len(tasks) // (processes*4))
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                             initargs=(xscale, noisedata, settings)) as pool:
+        for scan_no, filename, header, corrected, parsed, flags in pool.map(render_scan, tasks, chunksize=chunksize):
+            if flags is not None:
+                flagger.count(*flags)
+            if parsed is not None and cache is not None:
+                cache.put(filepaths[scan_no-1], parsed[0], parsed[1])
+            for writer in writers:
+                writer.write(filename, header, corrected, xscale + shifts[scan_no-1] if shifts[scan_no-1] else xscale)
+            yield scan_no, filename
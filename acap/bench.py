@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the processing stages on synthetic nights.
+
+    python -m acap.bench --scans 10 100 500 --output bench.json
+    python -m acap.bench --compare bench.json
+
+For each number of scans a synthetic night is written to a temporary folder
+(see acap/synthetic.py) and every stage is timed on it:
+
+    parse    reading and parsing every raw scan (no cache)
+    cached   loading every raw scan again from a warm scan cache
+    noise    parsing and accumulating the noise scans into a noise profile
+    correct  dividing every scan by the noise profile
+    render   rendering and saving single spectra (at most --render-scans)
+    write    writing the processed spectra in the --outputs formats
+    lines    Gaussian fits of the line of every scan and channel
+
+Each stage is run --repeat times and the fastest time kept. Results are
+saved as JSON with the machine and library versions, so runs on different
+commits can be compared with --compare. Nothing needs network access.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+
+import numpy as np
+
+from acap.spectrum import Spectrum
+from acap.cache import ScanCache
+from acap.cube import ScanCube
+from acap.noise import NoiseProfile
+from acap.writers import open_writers
+from acap.lines import measure_lines
+from acap.synthetic import write_night
+
+STAGES = ('parse', 'cached', 'noise', 'correct', 'render', 'write', 'lines')
+
+
+def best_time(function, repeat):
+    '''
+    Fastest of repeat runs of function(), in seconds.
+    '''
+    times = []
+    for k in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_scale(directory, num_scans, args):
+    '''
+    Time every stage on a synthetic night of num_scans scans in directory.
+    '''
+    rawpaths, noisepaths = write_night(directory, num_scans, bins=args.bins, channels=args.channels)
+    timings = {}
+
+    timings['parse'] = best_time(lambda: [Spectrum(x) for x in rawpaths], args.repeat)
+
+    cache = ScanCache(os.path.join(directory, 'Cache'))
+    ScanCube.load(rawpaths, cache=cache)
+    timings['cached'] = best_time(lambda: ScanCube.load(rawpaths, cache=cache), args.repeat)
+
+    def accumulate():
+        profile = NoiseProfile()
+        for x in noisepaths:
+            profile.add(Spectrum(x).data)
+        return profile
+    timings['noise'] = best_time(accumulate, args.repeat)
+
+    cube = ScanCube.load(rawpaths)
+    noisedata = accumulate().mean
+    timings['correct'] = best_time(lambda: cube.corrected(noisedata), args.repeat)
+    corrected = cube.corrected(noisedata)
+
+    xscale = np.expand_dims(np.arange(-1000, -1000+5*args.bins, 5), axis = 1)
+    outputpath = os.path.join(directory, 'Processed Data')
+    os.makedirs(outputpath, exist_ok=True)
+
+    num_rendered = min(num_scans, args.render_scans)
+    if num_rendered > 0:
+        from acap.render import SpectrumRenderer
+        # The labels and transparency of the single spectra rendered by acap_3.py with a noise profile
+        renderer = SpectrumRenderer(xscale, np.arange(-1000, 1200, 200), 'Doppler-shifted frequency (kHz)',
+                                    'Intensity (Volts)', cube.num_channels, noisedata, alpha=0.5,
+                                    dpi=args.dpi, fmt=args.format)
+
+        def render():
+            for k in range(num_rendered):
+                renderer.render('Scan '+str(k+1), cube.data[k], corrected[k], os.path.join(outputpath, str(k+1)))
+        timings['render'] = best_time(render, args.repeat)
+
+    def write():
+        writers = open_writers(args.outputs, outputpath)
+        for k in range(num_scans):
+            filename = 'Scan '+str(k+1)
+            for writer in writers:
+                writer.write(filename, cube.headers[k], corrected[k], xscale)
+        for writer in writers:
+            writer.close()
+    timings['write'] = best_time(write, args.repeat)
+
+    axes = np.repeat(xscale[:,0][np.newaxis], num_scans, axis=0)
+    timings['lines'] = best_time(lambda: measure_lines(corrected, axes), args.repeat)
+
+    stages = {}
+    for stage in STAGES:
+        if stage not in timings:
+            continue
+        count = num_rendered if stage == 'render' else num_scans
+        stages[stage] = {'seconds': timings[stage], 'per_scan': timings[stage]/count, 'scans': count}
+    return {'scans': num_scans, 'bins': args.bins, 'channels': args.channels, 'stages': stages}
+
+
+def machine_info():
+    info = {'platform': platform.platform(), 'python': platform.python_version(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(), 'numpy': np.__version__}
+    try:
+        import matplotlib
+        info['matplotlib'] = matplotlib.__version__
+    except ImportError:
+        info['matplotlib'] = None
+    return info
+
+
+def print_results(results):
+    print('%6s  %-8s %10s %12s' % ('scans', 'stage', 'seconds', 'ms/scan'))
+    for result in results:
+        for stage, timing in result['stages'].items():
+            print('%6d  %-8s %10.4f %12.3f' % (result['scans'], stage, timing['seconds'], timing['per_scan']*1000))
+
+
+def compare(results, previous):
+    '''
+    Print the time of each stage relative to an earlier run (ratio < 1 is faster).
+    '''
+    before = {(r['scans'], stage): t['per_scan'] for r in previous['results'] for stage, t in r['stages'].items()}
+    print('\nCompared with ' + previous.get('created', 'previous run'))
+    print('%6s  %-8s %12s %12s %8s' % ('scans', 'stage', 'before', 'now', 'ratio'))
+    for result in results:
+        for stage, timing in result['stages'].items():
+            old = before.get((result['scans'], stage))
+            if old is None:
+                continue
+            print('%6d  %-8s %12.3f %12.3f %8.2f' % (result['scans'], stage, old*1000, timing['per_scan']*1000,
+                                                     timing['per_scan']/old if old else float('nan')))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m acap.bench', description='Time the processing stages on synthetic data.')
+    parser.add_argument('--scans', type=int, nargs='+', default=[10, 100], help='numbers of scans to benchmark (1 to 999)')
+    parser.add_argument('--bins', type=int, default=399, help='data points per scan (399 or 400 in real data)')
+    parser.add_argument('--channels', type=int, default=1, help='channels per scan')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each stage, the fastest is kept')
+    parser.add_argument('--render-scans', type=int, default=10, help='scans rendered per scale (0 to skip rendering)')
+    parser.add_argument('--dpi', type=int, default=100, help='resolution of rendered figures')
+    parser.add_argument('--format', default='png', help='figure format')
+    parser.add_argument('--outputs', default='txt', help='output formats for the write stage, e.g. txt,npz,bin')
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--keep', help='write the synthetic nights here instead of a temporary folder')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    root = args.keep if args.keep else tempfile.mkdtemp(prefix='acap-bench-')
+    results = []
+    try:
+        for num_scans in args.scans:
+            print('Benchmarking ' + str(num_scans) + ' scans')
+            results.append(run_scale(os.path.join(root, str(num_scans)), num_scans, args))
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_results(results)
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'machine': machine_info(),
+              'settings': {'bins': args.bins, 'channels': args.channels, 'repeat': args.repeat,
+                           'render_scans': args.render_scans, 'dpi': args.dpi, 'format': args.format,
+                           'outputs': args.outputs},
+              'results': results}
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print('Results saved - ' + args.output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
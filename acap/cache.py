@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent binary cache of parsed scans.
+
+Every parsed scan of a night is appended as raw float64 values to one
+store file in a sidecar directory next to the DATE/TARGET data, which is
+memory-mapped once, so a cached scan is a slice of it rather than a file
+of its own. An index keeps each scan's place in the store with the source
+path, mtime and size, so that edited files are parsed again. Space left
+by removed scans is reclaimed when the index is flushed.
+"""
+
+import os
+import json
+
+import numpy as np
+
+from acap.sources import stat as source_stat
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # Total size of the cached data blocks
+
+
+class ScanCache():
+    INDEX_NAME = 'scans.json'
+    STORE_NAME = 'scans.f64'
+    LEGACY_INDEX_NAME = 'index.json'  # One .npy file per scan, as kept by earlier versions
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, mmap_mode='r', read_only=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode  # None loads cached blocks fully into memory
+        # A read-only cache (e.g. in worker processes) never changes the index or the store
+        self.read_only = read_only
+        self.storepath = os.path.join(directory, self.STORE_NAME)
+        self.store = None  # Memory map of the store, opened on first use
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        if not read_only:
+            self.remove_legacy()
+
+        self.entries = self.load_index()
+        self.clock = max([e['last_used'] for e in self.entries.values()], default=0)
+        self.dirty = False
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_NAME)) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Scans appended after the index was last written are not in the store
+        size = os.path.getsize(self.storepath)//8 if os.path.exists(self.storepath) else 0
+        return {key: e for key, e in entries.items() if e['offset'] + int(np.prod(e['shape'])) <= size}
+
+    def remove_legacy(self):
+        '''
+        Delete the per-scan .npy files and index of an earlier cache.
+        '''
+        indexpath = os.path.join(self.directory, self.LEGACY_INDEX_NAME)
+        try:
+            with open(indexpath) as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry in legacy.values():
+            try:
+                os.remove(os.path.join(self.directory, entry['file']))
+            except (OSError, KeyError, TypeError):
+                pass
+        os.remove(indexpath)
+
+    def flush(self):
+        '''
+        Write the index to disk if any entry was added, used or removed,
+        first rewriting the store without removed scans when they take up
+        more space than the cached ones.
+        '''
+        if not self.dirty or self.read_only:
+            return
+        if os.path.exists(self.storepath) and os.path.getsize(self.storepath) > 2*self.total_bytes():
+            self.compact()
+        indexpath = os.path.join(self.directory, self.INDEX_NAME)
+        with open(indexpath+'.tmp', 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(indexpath+'.tmp', indexpath)
+        self.dirty = False
+
+    def compact(self):
+        store = self.open_store()
+        with open(self.storepath+'.tmp', 'wb') as f:
+            offset = 0
+            for entry in sorted(self.entries.values(), key=lambda e: e['offset']):
+                size = int(np.prod(entry['shape']))
+                f.write(np.ascontiguousarray(store[entry['offset']:entry['offset']+size]).tobytes())
+                entry['offset'] = offset
+                offset += size
+        # Scans already handed out keep the old store mapped until they are released
+        self.store = None
+        os.replace(self.storepath+'.tmp', self.storepath)
+
+    def open_store(self, end=0):
+        '''
+        Memory map of the store, opened again when it has grown past end.
+        '''
+        if self.store is None or len(self.store) < end:
+            self.store = np.memmap(self.storepath, dtype=np.float64, mode='r')
+        return self.store
+
+    def total_bytes(self):
+        return sum(e['nbytes'] for e in self.entries.values())
+
+    def get(self, filepath):
+        '''
+        Return (header, data) for filepath, or None if it is not cached or the
+        file has changed since it was cached.
+        '''
+        key = os.path.abspath(filepath)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stat = source_stat(filepath)
+        if entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            self.remove(key)
+            return None
+        end = entry['offset'] + int(np.prod(entry['shape']))
+        data = self.open_store(end)[entry['offset']:end].reshape(entry['shape'])
+        if self.mmap_mode is None:
+            data = np.array(data)
+        if not self.read_only:
+            self.clock += 1
+            entry['last_used'] = self.clock
+            self.dirty = True
+        return np.array(entry['header']), data
+
+    def put(self, filepath, header, data):
+        if self.read_only:
+            return
+        key = os.path.abspath(filepath)
+        stat = source_stat(filepath)
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        with open(self.storepath, 'ab') as f:
+            offset = f.tell()//8
+            f.write(data.tobytes())
+        self.remove(key)
+        self.clock += 1
+        self.entries[key] = {'offset': offset,
+                             'shape': list(data.shape),
+                             'mtime': stat.st_mtime_ns,
+                             'size': stat.st_size,
+                             'header': [str(h) for h in header],
+                             'nbytes': data.nbytes,
+                             'last_used': self.clock}
+        self.dirty = True
+        self.evict()
+
+    def remove(self, key):
+        '''
+        Forget a cached scan; its data is dropped from the store on the next
+        compaction.
+        '''
+        if self.read_only:
+            return
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+    def evict(self):
+        '''
+        Remove the least recently used entries until the cache fits max_bytes.
+        '''
+        total = self.total_bytes()
+        while total > self.max_bytes and self.entries:
+            key = min(self.entries, key=lambda k: self.entries[k]['last_used'])
+            total -= self.entries[key]['nbytes']
+            self.remove(key)
@@ -0,0 +1,865 @@
+# -*- coding: utf-8 -*-
+"""
+Console interface of the ClassicAnalysisProgram (run by acap_3.py).
+
+Every setting is asked for at the console, or answered from a job file
+when run headless (see acap/jobs.py). The processing itself is done by the
+acap modules, so importing this module does no work and matplotlib is
+only imported once a plot is shown or saved.
+"""
+
+import os
+import sys
+import itertools
+
+import numpy as np
+
+from acap.spectrum import scan_labels
+from acap.batch import render_scans
+from acap.cube import ScanCube
+from acap.solarcal import SolarCalibration
+from acap.watch import ScanWatcher, IncrementalProcessor
+from acap.noise import NoiseProfile
+from acap.pipeline import Night, tick_shift
+from acap.archive import TREND_NAME, scan_archive, save_trends, plot_trends
+from acap.velocity import frequency_axis, velocity_axis, velocity_shifts, earth_rotation_velocity, solar_peculiar_motion
+from acap.zoom import zoom_windows
+from acap.overlap import read_ahead, WriteBehind
+from acap.flags import ScanFlagger, masked, describe
+from acap.lines import measure_lines, table_rows, save_table as save_line_table
+from acap.waterfall import Waterfall
+from acap.preview import PREVIEW_DPI, RENDER_CACHE_NAME, RenderCache, ContactSheet, export_scans
+from acap.writers import open_writers, write_text, TextWriter
+from acap.sources import close_archives
+from acap.jobs import parse_args, answers_from_args
+from acap.instrument import PROFILER, enable_from
+
+# Code should not be directly changed, with the exceptions of filepaths (DATA_ROOT below, or --root).
+DATA_ROOT = r'/Users/owen/Desktop/Analysis/Python/ClassicData/'
+HEADER_LENGTH = 1
+POS_INDEX = 1
+CACHE_SIZE_MB = 512 # Maximum size of the parsed scan cache kept for each DATE/TARGET
+RENDER_PROCESSES = 1 # Worker processes used to render single spectra (1 renders them one by one and shows each plot)
+SAVE_SOLAR_TIMESERIES = 0 # Also save the per-bin and per-channel Solar calibration time series (.npz)
+PLOT_DPI = 1000 # Resolution of saved plots
+PLOT_FORMAT = 'png' # File format of saved plots
+OUTPUT_FORMATS = 'txt' # Processed data outputs: txt (one file per scan), npz and/or bin (one file per night)
+WATCH_INTERVAL = 10 # Seconds between checks for new scans when watching
+IO_THREADS = 0 # Threads reading ahead and saving behind when running headless (0 processes one scan at a time)
+FLAG_DATA = 0 # Flag saturated and RFI-affected data points and leave them out of the results (0 keeps every data point)
+MEMORY_LIMIT_MB = 0 # Memory used for the scans processed at once, read in chunks of scans (0 processes the whole night at once)
+PREVIEW = 0 # Save plots at PREVIEW_DPI with a contact sheet of every scan, and keep a render cache for EXPORT_SCANS
+EXPORT_SCANS = '' # Scans rendered at PLOT_DPI from the render cache instead of processing, e.g. '3,5-9' or '21:05-21:10'
+
+
+def pyplot(headless):
+    '''
+    matplotlib.pyplot, imported on first use. Plots are only saved, never
+    shown, when running unattended.
+    '''
+    import matplotlib.pyplot as plt
+    if headless and plt.get_backend().lower() != 'agg':
+        plt.switch_backend('Agg')
+    return plt
+
+
+def show(headless):
+    plt = pyplot(headless)
+    if headless:
+        plt.close('all')
+    else:
+        plt.show()
+
+
+def run_settings(options):
+    '''
+    Settings of the whole run, from the run options or the defaults above.
+    '''
+    return {'root': os.path.join(options['root'], '') if 'root' in options else DATA_ROOT,
+            'processes': int(options.get('processes', RENDER_PROCESSES)),
+            'dpi': int(options.get('dpi', PLOT_DPI)),
+            'format': options.get('format', PLOT_FORMAT),
+            'outputs': options.get('outputs', OUTPUT_FORMATS),
+            'watch': bool(options.get('watch', False)), # Process new scans as they arrive instead of the whole folder
+            'interval': float(options.get('interval', WATCH_INTERVAL)),
+            'archive': bool(options.get('archive', False)),
+            'threads': int(options.get('threads', IO_THREADS)),
+            'flags': bool(options.get('flags', FLAG_DATA)),
+            'memory': float(options.get('memory', MEMORY_LIMIT_MB)),
+            'preview': bool(options.get('preview', PREVIEW)),
+            'export': str(options.get('export', EXPORT_SCANS))}
+
+
+def run_job(answers, run, do_singlegraphs, do_enlarged_single_graphs, do_solarcal):
+    '''
+    Ask for the settings of one DATE/TARGET and process it in the chosen
+    analysis mode.
+    '''
+    ask = answers.ask
+    DATA_ROOT = run['root']
+    RENDER_PROCESSES = run['processes']
+    PLOT_DPI = run['dpi']
+    PLOT_FORMAT = run['format']
+    OUTPUT_FORMATS = run['outputs']
+    WATCH = run['watch']
+    WATCH_INTERVAL = run['interval']
+    IO_THREADS = run['threads']
+    FLAG_DATA = run['flags']
+    MEMORY_LIMIT_MB = run['memory']
+    max_bytes = int(MEMORY_LIMIT_MB*1024*1024) or None
+    PREVIEW = run['preview']
+    if PREVIEW:
+        # Quick-look plots; chosen scans are rendered at PLOT_DPI afterwards with EXPORT_SCANS
+        PLOT_DPI = PREVIEW_DPI
+    # Variables to determine whether the plots/data should be saved
+    do_savegraphs = int(ask('save_graphs', 'Save any graphs produced? (1/0) '))
+    do_savefiles = int(ask('save_files', 'Save any noise-reduced data produced? (1/0) '))
+    # Establish the files to be processed
+    TARGET = ask('target', 'Input target observed (e.g. Cep A - 1): ')
+    DATE = ask('date', 'Input date (e.g. 17-03-2021): ') # Date of observations
+    # Folders, scan cache and scan list of the night (see acap/pipeline.py)
+    night = Night(DATA_ROOT, DATE, TARGET, cache_size=CACHE_SIZE_MB*1024*1024)
+    TIMEZONE = night.timezone
+    path = night.path
+    print('Data path set to '+path)
+    noisepath = night.noisepath
+    print('Noise path set to '+noisepath)
+    processedpath = night.processedpath
+    print('Processed path set to '+processedpath)
+    plotpath = night.plotpath
+    print('Plot path set to '+plotpath)
+    enplotpath = night.enplotpath
+    print('Plot path set to '+enplotpath)
+    # If the output directories do not exist, create the appropriate folders
+    for directory in night.makedirs():
+        print('Directory path created for '+directory)
+    noiseprofilepath = night.noiseprofilepath
+    cachepath = night.cachepath
+    print('Cache path set to '+cachepath)
+    scancache = night.cache
+    
+    
+    # Create a list containing all raw split data files
+    # The manifest orders files by the scan number after 'UTC.' (so .20 sorts before .100) without renaming them
+    # Files starting with a '.', such as .DS_Store, are ignored
+    files = night.refresh()
+    # Print the list of filtered files
+    print('    Filtered files: ')
+    print(files)
+        
+    
+    # Input information on the files to plot the data
+    gain = 0 # In the future, gain and offset could be used to calibrate this program.
+    offset = 0 # e.g. a gain/offset value of 5/0.7 will yield a very different graph to values of 20/1.5. 
+    # And so these two values should be calibrated accordingly (ONLY IF YOU WANT TO CONVERT TO JY).
+    f_lower = int(ask('f_lower', 'Input lower frequency limit (e.g. -1000): '))
+    f_upper = int(ask('f_upper', 'Input upper frequency limit (e.g. +1000): '))
+    
+    # Determine what x and y scales will be used
+    ylab1 = "Intensity (Volts)" # y-axis output for SpectraCyber
+    yscale1const = 1
+        
+    ylab2 = "Flux density (Jy)" # Solar calibration for the methanol receiver is still required for this feature to work as intended
+    yscale2const = 0 # Change this value for whatever the conversion rate is
+    
+    ylab3 = "Mean intensity (Volts)" # Used for Solar calibration plots
+    
+    YSCALE = ask('yscale', 'Input y scale (v/j): ')
+    if YSCALE == 'v' or YSCALE == 'V':
+        yscaleconst = yscale1const
+    elif YSCALE == 'j' or YSCALE == 'J':
+        gain = float(ask('gain', 'Input gain (e.g. 10): '))
+        offset = float(ask('offset', 'Input offset (e.g. 1.05): '))
+        yscaleconst = yscale2const
+        
+    if do_singlegraphs == 1:
+        XSCALE = ask('xscale', 'Input x scale (f/v): ')
+        if XSCALE == 'f' or XSCALE == 'F':
+            if f_lower == -1000 and f_upper == 1000:
+                xTicks = np.arange(-1000, 1200, 200)
+                f_step = 5
+            elif f_lower == -2000 and f_upper == 0:
+                xTicks = np.arange(-2000, 200, 200)
+                f_step = 5
+            elif f_lower == 0 and f_upper == 2000:
+                xTicks = np.arange(-0, 2200, 200)
+                f_step = 5
+            elif f_lower == -2000 and f_upper == 2000:
+                xTicks = np.arange(-2000, 2400, 400)  
+                f_step = 10
+            else:
+                xTicks = np.arange(-2000, 2400, 400)
+                f_step = int(ask('f_step', 'Input frequency shift in kHz (e.g. 5): '))
+        elif XSCALE == 'v' or XSCALE == 'V':
+            if f_lower == -1000 and f_upper == 1000:
+                xTicks = np.arange(-45, 50, 10)
+                f_step = 5
+            elif f_lower == -2000 and f_upper == 0:
+                xTicks = np.arange(0, 95, 10)
+                f_step = 5
+            elif f_lower == 0 and f_upper == 2000:
+                xTicks = np.arange(-90, 5, 10)
+                f_step = 5
+            elif f_lower == -2000 and f_upper == 2000:
+                xTicks = np.arange(-90, 95, 20)
+                f_step = 10
+            else:
+                xTicks = np.arange(-90, 95, 20)
+                f_step = int(ask('f_step', 'Input frequency shift in kHz (e.g. 5): '))
+    
+    if do_solarcal == 1:
+        f_step = int(ask('f_step', 'Input frequency shift in kHz (e.g. 5): '))
+    
+    xlab = "Default x label"
+    
+    # Axes are memoized, so reprocessing with the same window and receiver reuses them
+    xlab1 = "Doppler-shifted frequency (kHz)"
+    xscale1 = frequency_axis(f_lower, f_upper, f_step)
+    
+    xlab2 = "LSR velocity (km/s)"
+    xscale2 = velocity_axis(f_lower, f_upper, f_step, 'h')
+    
+    xlab3 = "LSR velocity (km/s)"
+    xscale3 = velocity_axis(f_lower, f_upper, f_step, 'm')
+    
+    xlab4 = "Scan number"
+    # Per-scan LSR velocity shifts, relative to the shift applied to xscale
+    velocityParameters = None # (azimuth, altitude, galactic longitude, galactic latitude)
+    velocityShift = 0
+    scanShifts = np.zeros(len(files))
+
+    
+    if do_singlegraphs == 1:
+        if XSCALE == 'f' or XSCALE == 'F':
+            xscale = xscale1
+            xlab = xlab1
+        elif XSCALE == 'v' or XSCALE == 'V':
+            # Determine x-scale to be used
+            receiver = ask('receiver', 'Input receiver used (h/m): ')
+            if receiver == 'h' or receiver == 'H':
+                xlab = xlab2
+                xscale = xscale2
+            elif receiver == 'm' or receiver == 'M':
+                xlab = xlab3
+                xscale = xscale3
+            # Calculate velocity shifts for Earth rotation speed, heliocentric motion, Solar peculiar motion
+            azimuth = float(ask('azimuth', 'Input azimuth in degrees (e.g. 248.75): '))
+            altitude = float(ask('altitude', 'Input altitude in degrees (e.g. 31.83): '))
+            galacticLongitude = float(ask('galactic_longitude', 'Input Galactic Longitude of target observed (e.g. 49.5): '))
+            galacticLatitude = float(ask('galactic_latitude', 'Input Galactic Latitude of target observed (e.g. -0.4): '))
+            earthRotationVelocityTowardsTarget = float(earth_rotation_velocity(azimuth, altitude))
+            print('\nTarget has an Earth Rotation Velocity of ' + str(earthRotationVelocityTowardsTarget))
+            solarPeculiarMotion = float(solar_peculiar_motion(galacticLongitude, galacticLatitude))
+            print('\n\tSolar perculiar motion is ' + str(solarPeculiarMotion))
+            # The Earth's orbital velocity is found for each scan from the time in its header
+            if len(files) > 0:
+                scanShifts = velocity_shifts(night.times, azimuth, altitude, galacticLongitude, galacticLatitude)
+                velocityShift = float(np.mean(scanShifts))
+                print('\nVelocity shift is: ' + str(velocityShift) + ' (' + str(np.min(scanShifts)) + ' to ' + str(np.max(scanShifts)) + ' over the scans)')
+            else:
+                velocityShift = float(velocity_shifts(np.datetime64('now', 's'), azimuth, altitude, galacticLongitude, galacticLatitude))
+                print('\nVelocity shift is: ' + str(velocityShift))
+            velocityParameters = (azimuth, altitude, galacticLongitude, galacticLatitude)
+            xscale = xscale + velocityShift
+            tickShift = tick_shift(velocityShift)
+            print('Tick shift is: ' + str(tickShift))
+            xTicks += tickShift
+            
+            
+    datapoint_lower = int((f_lower/f_step)+200)
+    datapoint_upper = int(((f_upper-5)/f_step)+200)
+    # datapoint_upper subtracts 5 to account for range skipping the last data point
+    # e.g. a range of ±250 actually records from -250 to +245, the rest of the data points will be 0.0
+    print('\nRanging from data point '+str(datapoint_lower+1)+' to data point '+str(datapoint_upper+1))
+    # Saturated and RFI-affected data points in this range are flagged (see acap/flags.py)
+    noiseflagger = None
+    flagger = None
+    if FLAG_DATA:
+        noiseflagger = ScanFlagger(datapoint_lower, datapoint_upper+1)
+        flagger = ScanFlagger(datapoint_lower, datapoint_upper+1)
+    
+    
+    # If noise scans were taken, they will be averaged and the sum will be subtracted from the on-target scans
+    NOISE = ask('noise', 'Were noise scans taken for the target? (Y/N) ')
+    alphaValue = 1
+    if NOISE == 'Y' or NOISE == 'y':
+        alphaValue = 0.5
+        # A saved noise profile (e.g. from another target that night) can be reused instead of the Noise folder
+        NOISE_PROFILE = ask('noise_profile', 'Input a saved noise profile to reuse (leave blank to use the Noise folder): ')
+        if NOISE_PROFILE != '':
+            with PROFILER.stage('noise'):
+                noiseprofile = NoiseProfile.load(NOISE_PROFILE)
+            print('Noise profile loaded from '+NOISE_PROFILE)
+        else:
+            # Scan through files in the noise folder
+            # The profile saved by an earlier run is reused while the noise files are unchanged
+            noisefiles = []
+            def check_noise_scan(x, noiseplot, mask):
+                noisefiles.append(x)
+                print(x)
+                if mask is not None and mask.any():
+                    print('\tData points flagged (saturated or RFI): '+str(np.count_nonzero(mask)))
+            with PROFILER.stage('noise'):
+                noiseprofile = night.noise_profile(callback=check_noise_scan, flagger=noiseflagger)
+            if noisefiles:
+                print('Noise profile saved to '+noiseprofilepath)
+            else:
+                print('Noise profile loaded from '+noiseprofilepath)
+        noisedata = noiseprofile.mean
+        print('Noise scans averaged: '+str(noiseprofile.count))
+        if noiseprofile.flags is not None:
+            print('Noise flags: '+describe(noiseprofile.flags))
+        mean_noise, mean_std = noiseprofile.window_stats(datapoint_lower, datapoint_upper)
+        print('Mean noise: '+str(mean_noise))
+        print('Mean noise standard deviation: '+str(mean_std))
+        if do_singlegraphs == 1 and not answers.headless:
+            plt = pyplot(answers.headless)
+            plt.plot(xscale, noisedata+offset)
+            plt.yticks(np.arange(-1, 12, 1))
+            plt.xlabel(xlab)
+            plt.xticks(xTicks)  
+            plt.grid(True)
+            show(answers.headless)
+    
+    # The strongest line of every scan can be measured with a Gaussian fit (see acap/lines.py)
+    FIT_LINES = 'N'
+    if do_singlegraphs == 1:
+        FIT_LINES = ask('fit_lines', 'Fit a Gaussian line to every scan? (Y/N) ')
+    
+    # Every scan of the night can be shown as one time x frequency image (see acap/waterfall.py)
+    WATERFALL = 'N'
+    if do_singlegraphs == 1:
+        WATERFALL = ask('waterfall', 'Save a waterfall of the whole night? (Y/N) ')
+        if WATERFALL == 'Y' or WATERFALL == 'y':
+            waterfallStep = int(ask('waterfall_step', 'Scans averaged into each row of the waterfall (e.g. 1): '))
+    
+    
+    # Processed spectra are written in each of the OUTPUT_FORMATS
+    writers = []
+    if do_savefiles == 1 and do_singlegraphs == 1:
+        writers = open_writers(OUTPUT_FORMATS, processedpath, resume=WATCH)
+    
+    watching = WATCH and (do_singlegraphs == 1 or do_solarcal == 1)
+    if watching:
+        # Only scans not yet recorded in the watch state file are processed, one at a time as they arrive
+        if NOISE == 'Y' or NOISE == 'y':
+            profile = noisedata
+        else:
+            profile = None
+            mean_noise = None
+        settings = {'target': TARGET, 'timezone': TIMEZONE, 'offset': offset,
+                    'savegraphs': do_savegraphs == 1, 'plotpath': plotpath,
+                    'singlegraphs': do_singlegraphs == 1, 'solarcal': do_solarcal == 1,
+                    'lower': datapoint_lower, 'upper': datapoint_upper, 'mean_noise': mean_noise,
+                    'solarpath': processedpath+'Watch Solar calibration.csv', 'flagger': flagger}
+        watchxscale = None
+        if do_singlegraphs == 1:
+            watchxscale = xscale
+            settings.update({'alpha': alphaValue, 'xticks': xTicks, 'xlabel': xlab, 'ylabel': ylab1,
+                             'dpi': PLOT_DPI, 'format': PLOT_FORMAT,
+                             'velocity': velocityParameters, 'velocity_shift': velocityShift})
+        watcher = ScanWatcher(path, os.path.join(DATA_ROOT, '')+DATE+'/'+TARGET+'/Watch state.json', WATCH_INTERVAL)
+        with PROFILER.stage('watch'):
+            watcher.run(IncrementalProcessor(settings, watchxscale, profile, scancache, writers))
+    
+    # Plot graphs for all files in selected folder
+    cube = None # Scans loaded by the serial loop are reused by the enlarged mode
+    if do_singlegraphs == 1 and RENDER_PROCESSES > 1 and not watching:
+        # Scans are rendered and saved by a pool of worker processes, plots are not shown
+        settings = {'target': TARGET, 'timezone': TIMEZONE, 'offset': offset,
+                    'alpha': alphaValue, 'xticks': xTicks, 'xlabel': xlab,
+                    'ylabel': ylab1, 'savegraphs': do_savegraphs == 1,
+                    'savefiles': any(isinstance(w, TextWriter) for w in writers), 'plotpath': plotpath,
+                    'processedpath': processedpath, 'cachepath': cachepath,
+                    'dpi': PLOT_DPI, 'format': PLOT_FORMAT}
+        if NOISE == 'Y' or NOISE == 'y':
+            profile = noisedata
+        else:
+            profile = None
+        # Work done in the worker processes is timed as a whole, without its byte counts
+        with PROFILER.stage('render (pool)'):
+            for scan_no, filename in render_scans([path+x for x in files], xscale, profile, settings, RENDER_PROCESSES,
+                                                  scancache, [w for w in writers if not isinstance(w, TextWriter)],
+                                                  scanShifts - velocityShift, flagger):
+                PROFILER.add(files=1)
+                print('Filename - '+filename)
+                if (do_savefiles == 1):
+                    print('File saved - '+filename)
+    elif do_singlegraphs == 1 and IO_THREADS > 0 and answers.headless and not watching:
+        # Reading, correction and saving overlap: scans are read ahead on IO_THREADS threads,
+        # and figures and processed data are saved behind on one thread each (see acap/overlap.py)
+        if NOISE == 'Y' or NOISE == 'y':
+            profile = noisedata
+        else:
+            profile = None
+        from acap.render import SpectrumRenderer
+        renderers = []
+        def render(title, scandata, scancorrected, filepath, scanxscale):
+            # matplotlib is not thread-safe, so every figure is drawn by the one rendering thread
+            if not renderers:
+                renderers.append(SpectrumRenderer(xscale, xTicks, xlab, ylab1, scandata.shape[1], profile,
+                                                  offset, alphaValue, PLOT_DPI, PLOT_FORMAT))
+            renderers[0].render(title, scandata, scancorrected, filepath, scanxscale)
+        def save_data(filename, header, scancorrected, scanxscale):
+            for writer in writers:
+                writer.write(filename, header, scancorrected, scanxscale)
+        with PROFILER.stage('overlapped'):
+            with WriteBehind(1) as rendering, WriteBehind(1) as saving:
+                scans = read_ahead([path+x for x in files], scancache, IO_THREADS)
+                for scan_no, (filepath, header, scandata) in enumerate(scans, start=1):
+                    print(files[scan_no-1])
+                    if profile is not None:
+                        scancorrected = scandata/profile+offset-1
+                    else:
+                        scancorrected = scandata
+                    if flagger is not None:
+                        scancorrected = masked(scancorrected, flagger.flag(scandata))
+                    title, filename = scan_labels(header, TARGET, scan_no, TIMEZONE)
+                    scanxscale = xscale + (scanShifts[scan_no-1] - velocityShift)
+                    if (do_savegraphs == 1):
+                        rendering.submit(render, title, scandata, scancorrected, plotpath+filename, scanxscale)
+                    # Processed data is saved on a single thread, so bundles keep the scan order
+                    saving.submit(save_data, filename, header, scancorrected, scanxscale)
+                    print('Filename - '+filename)
+                    if (do_savefiles == 1):
+                        print('File saved - '+filename)
+    elif do_singlegraphs == 1 and not watching:
+        # Every scan is loaded once and noise-corrected in a single operation, or one chunk of
+        # scans at a time when the memory used is limited (MEMORY_LIMIT_MB)
+        if NOISE == 'Y' or NOISE == 'y':
+            profile = noisedata
+        else:
+            profile = None
+        renderer = None
+        for first, cube, corrected, mask in night.chunks(max_bytes, profile, offset, flagger):
+            if answers.headless and do_savegraphs == 1 and renderer is None:
+                from acap.render import SpectrumRenderer
+                renderer = SpectrumRenderer(xscale, xTicks, xlab, ylab1, cube.num_channels, profile,
+                                            offset, alphaValue, PLOT_DPI, PLOT_FORMAT)
+            for k in range(len(cube)):
+                scan_no = first+k+1
+                x = files[scan_no-1]
+                print(x)
+                scandata = cube.data[k]
+                title, filename = scan_labels(cube.headers[k], TARGET, scan_no, TIMEZONE)
+                # Each scan is moved by its own velocity shift
+                scanxscale = xscale + (scanShifts[scan_no-1] - velocityShift)
+                if answers.headless:
+                    # Figures are only saved, so one figure is reused for every scan
+                    if (do_savegraphs == 1):
+                        with PROFILER.stage('render'):
+                            renderer.render(title, scandata, corrected[k], plotpath+filename, scanxscale)
+                else:
+                    plt = pyplot(answers.headless)
+                    for i in range(cube.num_channels):
+                        plt.plot(scanxscale, (scandata[:,i]+offset), label = 'Noise-distorted methanol-line spectrum', alpha = alphaValue)
+                        if NOISE == 'Y' or NOISE == 'y':
+                            # The noise profile stays on the unshifted axis it was measured on
+                            plt.plot(xscale, noisedata[:,i]+offset, label = 'Noise profile', alpha = alphaValue)
+                            plt.plot(scanxscale, corrected[k][:,i], label = 'Undistorted methanol-line spectrum')
+                    plt.xticks(xTicks)
+                    plt.yticks(np.arange(-1, 12, 1))
+                    plt.grid(True)
+                    plt.tick_params(direction ='in')
+                    font = 'arial'
+                    plt.rc('font', size=9)
+                    plt.rc('axes', labelsize=11)
+                    plt.rc('axes', titlesize=11)
+                    plt.ylabel(ylab1, family=font) 
+                    plt.xlabel(xlab, family=font)
+                    plt.title(title, family=font)
+                    plt.rcParams["figure.dpi"] = PLOT_DPI
+                    plt.legend()
+                    # Save figures as high resolution .png files ~ 0.5 MB each file
+                    if (do_savegraphs == 1):
+                        with PROFILER.stage('render'):
+                            plt.savefig(plotpath+filename+'.'+PLOT_FORMAT, dpi = PLOT_DPI)
+                            PROFILER.add_file(plotpath+filename+'.'+PLOT_FORMAT)
+                    show(answers.headless)
+                print('Filename - '+filename) 
+                with PROFILER.stage('write'):
+                    for writer in writers:
+                        writer.write(filename, cube.headers[k], corrected[k], scanxscale)
+                if (do_savefiles == 1):
+                    print('File saved - '+filename)
+        if max_bytes:
+            # Only the last chunk is held, so the enlarged mode reads the scans again
+            cube = None
+                
+    # Plot enlarged graphs of the scans loaded above, for one or more frequency windows
+    if do_enlarged_single_graphs == 1 and not watching:
+        # Several windows can be given at once, e.g. -1600,200 and -600,600
+        en_f_lower = ask('en_f_lower', 'Input lower frequency limit(s) (e.g. -1600 or -1600,200): ')
+        en_f_upper = ask('en_f_upper', 'Input upper frequency limit(s) (e.g. -600 or -600,600): ')
+        if cube is None:
+            # Scans rendered by the worker processes or in chunks are read back from the scan cache
+            # The scans were already counted when they were flagged
+            chunks = night.chunks(max_bytes, noisedata if (NOISE == 'Y' or NOISE == 'y') else None, offset,
+                                  flagger, count=False)
+        else:
+            chunks = iter([(0, cube, corrected, None)])
+        chunk = next(chunks)
+        first, cube, corrected, mask = chunk
+        windows = zoom_windows(en_f_lower, en_f_upper, f_lower, f_step, cube.data.shape[1])
+        windowTicks = []
+        renderers = []
+        for window in windows:
+            print(window.label+': data points '+str(window.start+1)+' to '+str(window.stop))
+            if not answers.headless:
+                # Display a temporary graph of the last scan loaded to choose the ticks from
+                plt = pyplot(answers.headless)
+                for i in range(cube.num_channels):
+                    plt.plot(xscale[window.slice], cube.data[-1, window.slice, i]+offset, label = 'Noise-distorted methanol-line spectrum', alpha = alphaValue)
+                    if NOISE == 'Y' or NOISE == 'y':
+                        plt.plot(xscale[window.slice], noisedata[window.slice, i]+offset, label = 'Noise profile', alpha = alphaValue)
+                        plt.plot(xscale[window.slice], corrected[-1, window.slice, i], label = 'Undistorted methanol-line spectrum')
+                plt.yticks(np.arange(-1, 12, 1))
+                plt.grid(True)
+                plt.xlabel(xlab)
+                plt.ylabel(ylab1)
+                plt.title(TARGET+' - '+window.label)
+                plt.legend()
+                show(answers.headless)
+            # Ask what the lower and upper x axis should be
+            graphLowerTickX = int(ask('tick_lower', 'Input the x lower tick (e.g. 30): '))
+            graphUpperTickX = int(ask('tick_upper', 'Input the x upper tick (e.g. 75): '))
+            graphStepsX = int(ask('tick_step', 'Input the x increment (e.g. 5): '))
+            windowTicks.append(np.arange(graphLowerTickX, graphUpperTickX, graphStepsX))
+            if answers.headless and do_savegraphs == 1:
+                # One figure per window, reused for every scan
+                from acap.render import SpectrumRenderer
+                renderers.append(SpectrumRenderer(xscale[window.slice], windowTicks[-1], xlab, ylab1, cube.num_channels,
+                                                  noisedata[window.slice] if (NOISE == 'Y' or NOISE == 'y') else None,
+                                                  offset, alphaValue, PLOT_DPI, PLOT_FORMAT))
+        # Every window of a scan is rendered from views of the loaded data in a single pass
+        for first, cube, corrected, mask in itertools.chain([chunk], chunks):
+            for j in range(len(cube)):
+                scan_no = first+j+1
+                x = files[scan_no-1]
+                print(x)
+                title, filename = scan_labels(cube.headers[j], TARGET, scan_no, TIMEZONE)
+                scanxscale = xscale + (scanShifts[scan_no-1] - velocityShift)
+                for k, window in enumerate(windows):
+                    windowdata = cube.data[j, window.slice]
+                    windowcorrected = corrected[j, window.slice]
+                    windowxscale = scanxscale[window.slice]
+                    windowname = filename+' '+window.label
+                    with PROFILER.stage('enlarged render'):
+                        if answers.headless:
+                            if (do_savegraphs == 1):
+                                renderers[k].render(title, windowdata, windowcorrected, enplotpath+windowname, windowxscale)
+                        else:
+                            plt = pyplot(answers.headless)
+                            for i in range(cube.num_channels):
+                                plt.plot(windowxscale, windowdata[:,i]+offset, label = 'Noise-distorted methanol-line spectrum', alpha = alphaValue)
+                                if NOISE == 'Y' or NOISE == 'y':
+                                    plt.plot(xscale[window.slice], noisedata[window.slice, i]+offset, label = 'Noise profile', alpha = alphaValue)
+                                    plt.plot(windowxscale, windowcorrected[:,i], label = 'Undistorted methanol-line spectrum')
+                            plt.xlabel(xlab)
+                            plt.xticks(windowTicks[k])
+                            plt.yticks(np.arange(-1, 12, 1))
+                            plt.grid(True)
+                            plt.legend()
+                            plt.ylabel(ylab1) 
+                            plt.title(title)
+                            # Save figures as high resolution .png files ~ 0.5 MB each file
+                            if (do_savegraphs == 1):
+                                plt.savefig(enplotpath+windowname+'.'+PLOT_FORMAT, dpi = PLOT_DPI)
+                                PROFILER.add_file(enplotpath+windowname+'.'+PLOT_FORMAT)
+                    if not answers.headless:
+                        show(answers.headless)
+                    if (do_savefiles == 1):
+                        # The window's own processed data and x-axis
+                        with PROFILER.stage('enlarged write'):
+                            write_text(processedpath+windowname+'.txt', np.hstack([windowcorrected, windowxscale]))
+                        print('File saved - '+windowname+'.txt')
+        if max_bytes:
+            cube = None
+    
+    # Measure the line of every scan on the axis the spectra are plotted on, in one batch per chunk of scans
+    if (FIT_LINES == 'Y' or FIT_LINES == 'y') and not watching:
+        if cube is None:
+            chunks = night.chunks(max_bytes, noisedata if (NOISE == 'Y' or NOISE == 'y') else None, offset,
+                                  flagger, count=False)
+        else:
+            chunks = iter([(0, cube, corrected, None)])
+        linerows = []
+        with PROFILER.stage('lines'):
+            for first, cube, corrected, mask in chunks:
+                # Each scan's own velocity shift, as in the plots
+                axes = xscale[:,0] + (scanShifts[first:first+len(cube)] - velocityShift)[:, np.newaxis]
+                fits = measure_lines(corrected, axes, datapoint_lower, datapoint_upper+1)
+                linerows += table_rows(fits, first, cube.times)
+        fitted = [row for row in linerows if row['converged']]
+        print('Lines fitted: '+str(len(fitted))+' of '+str(len(linerows)))
+        if fitted:
+            print('Median centre: '+str(np.median([row['centre'] for row in fitted]))
+                  + ', median FWHM: '+str(np.median([row['fwhm'] for row in fitted]))+' ('+xlab+')')
+        if (do_savefiles == 1):
+            save_line_table(processedpath+'Line fits.csv', linerows, xlab)
+            print('File saved - Line fits.csv')
+        if max_bytes:
+            cube = None
+    
+    # One image of the whole night, built a chunk of scans at a time
+    if (WATERFALL == 'Y' or WATERFALL == 'y') and not watching:
+        if cube is None:
+            chunks = night.chunks(max_bytes, noisedata if (NOISE == 'Y' or NOISE == 'y') else None, offset,
+                                  flagger, count=False)
+        else:
+            chunks = iter([(0, cube, corrected, None)])
+        waterfall = Waterfall(xscale, waterfallStep)
+        with PROFILER.stage('waterfall'):
+            for first, cube, corrected, mask in chunks:
+                # Scans with their own velocity shift are regridded onto the mean-shifted axis
+                axes = None
+                if np.any(scanShifts != velocityShift):
+                    axes = xscale[:,0] + (scanShifts[first:first+len(cube)] - velocityShift)[:, np.newaxis]
+                waterfall.add(corrected, cube.times, axes)
+            waterfall.save(plotpath+'Waterfall', TARGET+' - '+DATE, xlab, ylab1, xTicks, PLOT_DPI, PLOT_FORMAT)
+        print('Graph saved - Waterfall.'+PLOT_FORMAT)
+        if max_bytes:
+            cube = None
+    
+    # Thumbnails of every scan, and the render cache the chosen scans are exported from
+    if PREVIEW and do_singlegraphs == 1 and not watching:
+        if cube is None:
+            chunks = night.chunks(max_bytes, noisedata if (NOISE == 'Y' or NOISE == 'y') else None, offset,
+                                  flagger, count=False)
+        else:
+            chunks = iter([(0, cube, corrected, None)])
+        rendersettings = {'xscale': xscale[:,0].tolist(), 'xticks': np.asarray(xTicks).tolist(),
+                          'xlabel': xlab, 'ylabel': ylab1, 'offset': offset, 'alpha': alphaValue,
+                          'noise': noisedata.tolist() if (NOISE == 'Y' or NOISE == 'y') else None}
+        rendercache = RenderCache(cachepath+RENDER_CACHE_NAME, rendersettings)
+        sheet = ContactSheet(plotpath+'Contact sheet', PREVIEW_DPI, PLOT_FORMAT)
+        with PROFILER.stage('preview'):
+            for first, cube, corrected, mask in chunks:
+                for k in range(len(cube)):
+                    scan_no = first+k+1
+                    title, filename = scan_labels(cube.headers[k], TARGET, scan_no, TIMEZONE)
+                    scanxscale = xscale + (scanShifts[scan_no-1] - velocityShift)
+                    rendercache.write(title, filename, cube.times[k], cube.data[k], corrected[k], scanxscale)
+                    sheet.add(scan_no, cube.times[k], corrected[k])
+            rendercache.close()
+            for sheetpath in sheet.close():
+                print('Graph saved - '+os.path.basename(sheetpath))
+        if max_bytes:
+            cube = None
+                
+                
+    # Plot graph for Solar calibration of one folder - WIP
+    if do_solarcal == 1 and not watching:
+        if NOISE != 'Y' and NOISE != 'y':
+            mean_noise = None
+        if max_bytes:
+            # The scans are reduced one chunk at a time when the memory used is limited (MEMORY_LIMIT_MB),
+            # and the per-bin time series is kept on disk
+            seriespath = cachepath+'Solar bin series.npy' if SAVE_SOLAR_TIMESERIES == 1 else None
+            lastheaders = []
+            def solar_chunks():
+                for first, chunk, corrected, mask in night.chunks(max_bytes, flagger=flagger):
+                    lastheaders[:] = chunk.headers[-1:]
+                    yield chunk, mask
+            with PROFILER.stage('solar'):
+                solarcal = SolarCalibration.from_chunks(solar_chunks(), datapoint_lower, datapoint_upper, mean_noise,
+                                                        seriespath, len(files))
+            lastheader = lastheaders[-1]
+        else:
+            # The windowed mean of every scan is computed in one reduction over the loaded scans
+            with PROFILER.stage('load'):
+                cube = ScanCube.load([path+x for x in files], cache=scancache)
+            mask = None
+            if flagger is not None:
+                with PROFILER.stage('flag'):
+                    mask = flagger.flag(cube.data)
+            with PROFILER.stage('solar'):
+                solarcal = SolarCalibration(cube, datapoint_lower, datapoint_upper, mean_noise, mask)
+            lastheader = cube.headers[-1]
+        for scan_no, x in enumerate(files, start=1):
+            print(scan_no)
+            print('\t'+x)
+            print('\t'+str(solarcal.means[scan_no-1]))
+        mean_data_no = len(solarcal)
+        mean_data = solarcal.means
+        scaninfo = str(lastheader).split(' ')
+        month_modifier = ''
+        day_modifier = ''
+        hour_modifier = ''
+        minute_modifier = ''
+        second_modifier = ''
+        if int(scaninfo[1]) < 10:
+            month_modifier = '0'
+        if int(scaninfo[2]) < 10:
+            day_modifier = '0'
+        if int(scaninfo[4]) < 10:
+            hour_modifier = '0'
+        if int(scaninfo[5]) < 10:
+            minute_modifier = '0'
+        if int(scaninfo[6]) < 10:
+            second_modifier = '0'
+        summary = solarcal.summary()
+        print('Mean: '+str(summary['mean'])+', median: '+str(summary['median'])+', std: '+str(summary['std']))
+        if summary['gain'] is not None:
+            print('Peak intensity above mean noise (gain estimate): '+str(summary['gain']))
+        mean_data = np.expand_dims(mean_data, axis = 1)
+        noise_x = np.arange(1, mean_data_no+1, 1)
+        noise_x = np.expand_dims(noise_x, axis = 1)
+        title = TARGET+' - Solar calibration - '+day_modifier+str(scaninfo[2])+'/'+month_modifier+str(scaninfo[1])+'/'+str(scaninfo[3])
+        filename = day_modifier+str(scaninfo[2])+'-'+month_modifier+str(scaninfo[1])+'-'+str(scaninfo[3])+' '+hour_modifier+str(scaninfo[4])+':'+minute_modifier+str(scaninfo[5])+':'+second_modifier+str(scaninfo[6])
+        # matplotlib is only imported when the plot is shown or saved
+        if do_savegraphs == 1 or not answers.headless:
+            plt = pyplot(answers.headless)
+            plt.plot(noise_x, mean_data[0:(len(mean_data)),:]+offset, label = 'Noise-distorted mean intensity')
+            if NOISE == 'Y' or NOISE == 'y':
+                noise_y = np.zeros(mean_data_no)
+                noise_y.fill(mean_noise)
+                plt.plot(noise_x, noise_y+offset, label = 'Mean noise')
+                plt.plot(noise_x, mean_data[0:(len(mean_data)),:]-mean_noise+offset, label = 'Undistorted mean intensity')
+            plt.grid(True)
+            plt.tick_params(direction ='in')
+            font = 'arial'
+            plt.ylabel(ylab3, family=font) 
+            plt.xlabel(xlab4, family=font)
+            plt.title(title, family=font)
+            plt.rc('font', size=9)
+            plt.rc('axes', labelsize=11)
+            plt.rc('axes', titlesize=11)
+            plt.rcParams["figure.dpi"] = PLOT_DPI
+            # Save figures as high resolution .png files ~ 0.5 MB each file
+            if (do_savegraphs == 1):
+                with PROFILER.stage('solar render'):
+                    plt.savefig(plotpath+filename+'.'+PLOT_FORMAT, dpi = PLOT_DPI)
+                    PROFILER.add_file(plotpath+filename+'.'+PLOT_FORMAT)
+            show(answers.headless)
+        if NOISE == 'Y' or NOISE == 'y':
+            sumdata = mean_data[0:len(mean_data),:]-mean_noise+offset
+            savedata = np.hstack([sumdata, (noise_x)])
+        else:
+            savedata = np.hstack([mean_data[0:len(mean_data),:], (noise_x)])
+        print('Filename - '+filename) 
+        if (do_savefiles == 1):
+            write_text(processedpath+filename+'.txt', savedata)
+            print('File saved - '+filename+'.txt')
+            solarcal.save_table(processedpath+filename+' Solar calibration.csv')
+            print('File saved - '+filename+' Solar calibration.csv')
+            if SAVE_SOLAR_TIMESERIES == 1:
+                solarcal.save_timeseries(processedpath+filename+' Solar calibration.npz')
+                print('File saved - '+filename+' Solar calibration.npz')
+            
+
+    if flagger is not None and flagger.scans > 0:
+        print('Flags: '+describe(flagger.summary()))
+    if writers:
+        with PROFILER.stage('write'):
+            for writer in writers:
+                writer.close()
+    scancache.flush()
+    # Files read from an archived night are not kept for the next job
+    close_archives()
+
+
+def run_archive(answers, run):
+    '''
+    Summarise every DATE/TARGET under the root into one trend table and plot.
+    '''
+    DATA_ROOT = run['root']
+    f_lower = int(answers.defaults['f_lower'])
+    f_upper = int(answers.defaults['f_upper'])
+    f_step = int(answers.defaults.get('f_step', 5))
+    datapoint_lower = int((f_lower/f_step)+200)
+    datapoint_upper = int(((f_upper-5)/f_step)+200)
+    print('Summarising '+DATA_ROOT+' from data point '+str(datapoint_lower+1)+' to data point '+str(datapoint_upper+1))
+    # Each night is summarised by its own worker process
+    processes = run['processes'] if 'processes' in answers.options else os.cpu_count()
+    with PROFILER.stage('archive'):
+        rows = scan_archive(DATA_ROOT, datapoint_lower, datapoint_upper, processes, run['flags'],
+                            int(run['memory']*1024*1024) or None)
+    for row in rows:
+        if row['error'] != '':
+            print(row['date']+' '+row['target']+' - '+row['error'])
+        else:
+            print(row['date']+' '+row['target']+' - '+str(row['scans'])+' scans, mean '+str(row['mean']))
+    save_trends(rows, DATA_ROOT+TREND_NAME+'.csv')
+    print('File saved - '+DATA_ROOT+TREND_NAME+'.csv')
+    if rows:
+        plot_trends(rows, DATA_ROOT+TREND_NAME, run['dpi'], run['format'])
+        print('File saved - '+DATA_ROOT+TREND_NAME+'.'+run['format'])
+
+
+def run_export(answers, run):
+    '''
+    Render the scans of one DATE/TARGET chosen with EXPORT_SCANS at full
+    resolution, from the render cache saved by a preview run.
+    '''
+    TARGET = answers.ask('target', 'Input target observed (e.g. Cep A - 1): ')
+    DATE = answers.ask('date', 'Input date (e.g. 17-03-2021): ')
+    night = Night(run['root'], DATE, TARGET)
+    for directory in night.makedirs():
+        print('Directory path created for '+directory)
+    with PROFILER.stage('export'):
+        saved = export_scans(night.cachepath+RENDER_CACHE_NAME, run['export'], night.plotpath, run['dpi'], run['format'])
+    for filename in saved:
+        print('Graph saved - '+filename+'.'+run['format'])
+    print(str(len(saved))+' scans exported at '+str(run['dpi'])+' dpi')
+
+
+def main(argv=None):
+    # Prompts are answered at the console, or from a job file when run headless
+    answers = answers_from_args(parse_args(sys.argv[1:] if argv is None else argv))
+    ask = answers.ask
+    # Stage timings are only recorded with --profile or ACAP_PROFILE set
+    enable_from(answers.options.get('profile'))
+    run = run_settings(answers.options)
+    if run['archive']:
+        run_archive(answers, run)
+        PROFILER.report()
+        return
+    if run['export']:
+        running = True
+        while running:
+            run_export(answers, run)
+            QUIT = ask('another', 'Export scans of another set of data (Y/N)? ')
+            running = QUIT == 'Y' or QUIT == 'y'
+        PROFILER.report()
+        return
+
+    # Variables to determine the type of scan performed
+    do_singlegraphs = 0
+    do_enlarged_single_graphs = 0
+    do_solarcal = 0
+    if answers.headless:
+        # Each job chooses its own analysis mode at the start of the loop
+        running = len(answers.jobs) > 0
+    else:
+        print('----------------------------------------')
+        print('This program has 3 analysis modes:\n - Single spectrum analysis.\n - Enlarged single spectrum analysis.\n - Solar calibration.')
+        print('----------------------------------------')
+        do_singlegraphs = int(ask('singlegraphs', 'Perform analysis of individual spectra? (1/0) '))
+        if(do_singlegraphs == 1):
+            do_enlarged_single_graphs = int(ask('enlarged', 'Perform analysis of enlarged individual spectra? (1/0) ')) 
+            running = True
+        elif(do_singlegraphs == 0):
+            do_solarcal = int(ask('solarcal', 'Perform analysis of Solar calibration? (1/0) '))
+            if(do_solarcal == 0):
+                print('\nNo other analysis modes are available')
+                running = False
+            elif(do_solarcal == 1):
+                running = True
+
+    while running == True:
+        if answers.headless:
+            do_singlegraphs = int(ask('singlegraphs', 'Perform analysis of individual spectra? (1/0) '))
+            do_enlarged_single_graphs = int(ask('enlarged', 'Perform analysis of enlarged individual spectra? (1/0) '))
+            do_solarcal = int(ask('solarcal', 'Perform analysis of Solar calibration? (1/0) '))
+        run_job(answers, run, do_singlegraphs, do_enlarged_single_graphs, do_solarcal)
+
+        # Quit program if no further scans to be analysed
+        QUIT = ask('another', 'Analyse another set of data (Y/N)? ')
+        if QUIT == 'Y' or QUIT == 'y':
+            running = True
+        if QUIT == 'N' or QUIT == 'n':
+            running = False
+
+    # Summary of the stage timings when profiling
+    PROFILER.report()
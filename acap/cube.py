@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+All scans of one DATE/TARGET held in a single (scans x bins x channels) array.
+"""
+
+import numpy as np
+
+from acap.spectrum import Spectrum, scan_time
+from acap.flags import masked
+from acap.instrument import PROFILER
+
+WORKING_COPIES = 8  # Arrays the size of the loaded scans alive at once while they are corrected
+FLAGGED_COPIES = 12  # The same while they are also flagged (see acap/flags.py)
+
+
+def chunk_scans(max_bytes, bins, channels, copies=WORKING_COPIES):
+    '''
+    Number of scans of bins x channels that can be processed at once
+    within max_bytes, with copies arrays of their size alive at once.
+    '''
+    return max(1, int(max_bytes // (bins*channels*np.dtype(np.float64).itemsize*copies)))
+
+
+class ScanCube():
+    def __init__(self, data, headers, filepaths=None):
+        self.data = data
+        self.headers = headers
+        self.filepaths = filepaths
+        self.times = np.array([scan_time(h) for h in headers], dtype='datetime64[s]')
+
+    @classmethod
+    def load(cls, filepaths, cache=None):
+        '''
+        Read every scan in filepaths into one contiguous float64 array.
+        All scans must have the same number of bins and channels.
+        '''
+        data = None
+        headers = []
+        for k, filepath in enumerate(filepaths):
+            scan = Spectrum(filepath, cache=cache)
+            if data is None:
+                data = np.empty((len(filepaths),)+scan.data.shape, dtype=np.float64)
+            elif scan.data.shape != data.shape[1:]:
+                raise ValueError(filepath+' has shape '+str(scan.data.shape)+', expected '+str(data.shape[1:]))
+            data[k] = scan.data
+            headers.append(scan.header)
+        if data is None:
+            data = np.empty((0, 0, 0), dtype=np.float64)
+        return cls(data, headers, list(filepaths))
+
+    @classmethod
+    def chunks(cls, filepaths, max_bytes=None, cache=None, copies=WORKING_COPIES):
+        '''
+        Yield (first, ScanCube) pieces of the scans in filepaths, first being
+        the index of the piece's first scan, with as many scans in each as
+        can be processed within max_bytes (all of them when None) with
+        copies arrays of their size alive at once, so the memory used does
+        not grow with the number of scans.
+        '''
+        if not max_bytes or not filepaths:
+            with PROFILER.stage('load'):
+                cube = cls.load(filepaths, cache=cache)
+            yield 0, cube
+            return
+        size = None
+        first = 0
+        while first < len(filepaths):
+            with PROFILER.stage('load'):
+                if size is None:
+                    shape = Spectrum(filepaths[0], cache=cache).data.shape
+                    size = chunk_scans(max_bytes, shape[0], shape[1], copies)
+                cube = cls.load(filepaths[first:first+size], cache=cache)
+            yield first, cube
+            first += size
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def num_channels(self):
+        return self.data.shape[2]
+
+    def window(self, lower=None, upper=None):
+        '''
+        View of the data points lower:upper of every scan (no copy).
+        '''
+        return self.data[:, lower:upper, :]
+
+    def corrected(self, noisedata, offset=0, lower=None, upper=None, mask=None):
+        '''
+        Noise-undistorted spectra (data/noise + offset - 1) of every scan.
+        Data points flagged in mask (scans x bins x channels) are NaN.
+        '''
+        corrected = self.window(lower, upper)/noisedata[lower:upper]+offset-1
+        if mask is not None:
+            corrected[mask[:, lower:upper, :]] = np.nan
+        return corrected
+
+    def stacked(self, noisedata=None, offset=0, lower=None, upper=None, mask=None):
+        '''
+        Mean spectrum over all scans, noise-corrected if noisedata is given.
+        Data points flagged in mask are left out of the mean.
+        '''
+        window = self.window(lower, upper)
+        if mask is not None and mask.any():
+            stacked = np.nanmean(masked(window, mask[:, lower:upper, :]), axis=0)
+        else:
+            stacked = np.mean(window, axis=0)
+        if noisedata is None:
+            return stacked
+        return stacked/noisedata[lower:upper]+offset-1
+
+    def window_means(self, lower=None, upper=None):
+        '''
+        Mean of the data points lower:upper over all channels, for each scan.
+        '''
+        return np.mean(self.window(lower, upper), axis=(1, 2), dtype=np.float64)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Data quality flags of SpectraCyber scans.
+
+Data points at the receiver limits (0 V and 10 V) are flagged as
+saturated, and spikes standing out from the running median of their
+neighbouring bins by more than RFI_THRESHOLD robust standard deviations
+(median absolute deviation) are flagged as RFI when they are no wider than
+one bin. Spectral lines are wider than that, even narrow ones, so they
+are kept. Every bin and channel of one scan or of a whole (scans x bins x
+channels) cube is checked at once.
+"""
+
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SATURATION_LOW = 0.0  # Receiver output limits in Volts
+SATURATION_HIGH = 10.0
+RFI_THRESHOLD = 6.0  # Robust standard deviations from the running median
+RFI_WIDTH = 15  # Bins in the running median, wide enough for it to follow the baseline under a line
+SPIKE_NEIGHBOUR = 3.0  # Robust standard deviations within which both adjacent bins of an RFI spike lie
+MAD_SCALE = 1.4826  # Median absolute deviation to standard deviation of normally distributed noise
+
+
+def running_median(data, width=RFI_WIDTH):
+    '''
+    Median of the width-1 neighbours of each data point along the bins
+    (second to last axis), the ends being padded with the first and last
+    bins. The data point itself is left out, otherwise it would be its own
+    median in many windows and make the spread of the residuals too small.
+    The bins are taken in blocks, so the windows of each block take up
+    about half as much memory as data.
+    '''
+    half = width // 2
+    pad = [(0, 0)]*data.ndim
+    pad[-2] = (half, half)
+    padded = np.pad(data, pad, mode='edge')
+    bins = data.shape[-2]
+    block = max(1, bins // max(4*half, 1))
+    median = np.empty(data.shape, dtype=np.float64)
+    nan = np.isnan(data).any()
+    for start in range(0, bins, block):
+        end = min(start+block, bins)
+        windows = np.delete(sliding_window_view(padded[..., start:end+2*half, :], 2*half+1, axis=-2), half, axis=-1)
+        if nan:
+            with warnings.catch_warnings():
+                # Within a long run of NaN data points the median is NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                median[..., start:end, :] = np.nanmedian(windows, axis=-1, overwrite_input=True)
+        else:
+            median[..., start:end, :] = np.median(windows, axis=-1, overwrite_input=True)
+    return median
+
+
+def flag_scans(data, lower=None, upper=None, threshold=RFI_THRESHOLD, width=RFI_WIDTH):
+    '''
+    (saturated, rfi) boolean masks of data (bins x channels, or scans x
+    bins x channels). Only the data points lower:upper are checked, as
+    those outside the frequency range are 0.
+    '''
+    data = np.asarray(data)
+    saturated = np.zeros(data.shape, dtype=bool)
+    rfi = np.zeros(data.shape, dtype=bool)
+    window = data[..., lower:upper, :]
+    if window.shape[-2] == 0:
+        return saturated, rfi
+    clipped = (window <= SATURATION_LOW) | (window >= SATURATION_HIGH)
+    saturated[..., lower:upper, :] = clipped
+    # Saturated data points are left out of the running median and the spread
+    window = masked(window, clipped)
+    median = running_median(window, width)
+    residual = window - median
+    median_of = np.nanmedian if clipped.any() else np.median
+    # The deviations are worked on in place, to keep the memory used down for a chunk of scans
+    deviation = residual - median_of(residual, axis=-2, keepdims=True)
+    mad = median_of(np.abs(deviation, out=deviation), axis=-2, keepdims=True, overwrite_input=True)
+    del deviation
+    # Median absolute deviation of each scan and channel; one with no spread at all has no spikes
+    with np.errstate(invalid='ignore'):
+        spikes = (np.abs(residual) > threshold*MAD_SCALE*mad) & (mad > 0)
+    rfi[..., lower:upper, :] = spikes & single_bin(window, median, SPIKE_NEIGHBOUR*MAD_SCALE*mad)
+    return saturated, rfi
+
+
+def single_bin(data, median, limit):
+    '''
+    True where both adjacent bins of a data point lie within limit of its
+    running median, i.e. where a feature is no wider than one bin; the
+    bins either side of the peak of a line stand out as well. A missing
+    neighbour (at the ends, or flagged as saturated) does not count against
+    it.
+    '''
+    inside = np.ones(data.shape, dtype=bool)
+    # The bin before each data point, then the bin after it
+    for target, neighbour, centre in ((inside[..., 1:, :], data[..., :-1, :], median[..., 1:, :]),
+                                      (inside[..., :-1, :], data[..., 1:, :], median[..., :-1, :])):
+        deviation = neighbour - centre
+        np.abs(deviation, out=deviation)
+        with np.errstate(invalid='ignore'):
+            target &= (deviation < limit) | np.isnan(neighbour)
+    return inside
+
+
+def masked(data, mask):
+    '''
+    data with the flagged data points set to NaN (data itself when none
+    are flagged), so that they are left out of plots and nan statistics.
+    '''
+    if mask is None or not mask.any():
+        return data
+    return np.where(mask, np.nan, data)
+
+
+class ScanFlagger():
+    '''
+    Flags the data points lower:upper of scans and keeps running totals as
+    they are flagged, so the night's summary needs no second pass.
+    '''
+
+    def __init__(self, lower=None, upper=None, threshold=RFI_THRESHOLD, width=RFI_WIDTH):
+        self.lower = lower
+        self.upper = upper
+        self.threshold = threshold
+        self.width = width
+        self.scans = 0
+        self.flagged_scans = 0
+        self.checked = 0
+        self.saturated = 0
+        self.rfi = 0
+
+    @property
+    def settings(self):
+        return [self.lower, self.upper, self.threshold, self.width]
+
+    def flag(self, data, count=True):
+        '''
+        Boolean mask of the flagged data points of one scan or of every
+        scan in a cube. Scans flagged again (e.g. when reloaded) are not
+        counted twice with count=False.
+        '''
+        saturated, rfi = flag_scans(data, self.lower, self.upper, self.threshold, self.width)
+        if count:
+            self.count(saturated, rfi)
+        return saturated | rfi
+
+    def count(self, saturated, rfi):
+        '''
+        Add the masks of one scan or of a cube (e.g. flagged by a worker
+        process) to the totals.
+        '''
+        if saturated.ndim == 2:
+            saturated = saturated[np.newaxis]
+            rfi = rfi[np.newaxis]
+        self.scans += len(saturated)
+        self.flagged_scans += int(np.count_nonzero((saturated | rfi).reshape(len(saturated), -1).any(axis=1)))
+        self.checked += saturated[:, self.lower:self.upper, :].size
+        self.saturated += int(np.count_nonzero(saturated))
+        self.rfi += int(np.count_nonzero(rfi))
+
+    def summary(self):
+        return {'scans': self.scans, 'flagged_scans': self.flagged_scans, 'checked': self.checked,
+                'saturated': self.saturated, 'rfi': self.rfi}
+
+
+def describe(summary):
+    '''
+    One line describing a flag summary, e.g. for printing at the console.
+    '''
+    flagged = summary['saturated'] + summary['rfi']
+    fraction = 100.0*flagged/summary['checked'] if summary['checked'] else 0.0
+    return (str(summary['flagged_scans'])+' of '+str(summary['scans'])+' scans flagged: '
+            + str(summary['saturated'])+' saturated and '+str(summary['rfi'])+' RFI data points ('
+            + '%.3f' % fraction+'% of those checked)')
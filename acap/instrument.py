@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Timing and counters for the processing stages.
+
+Instrumentation is off unless switched on with --profile or the ACAP_PROFILE
+environment variable (ACAP_PROFILE=1, or a file name to also write a
+trace). While off, stage() returns one shared do-nothing context and add()
+returns straight away, so the instrumented code runs as before.
+
+    with PROFILER.stage('parse'):
+        ...
+        PROFILER.add(files=1, bytes_read=len(buffer))
+
+Each stage records its wall time, calls, files, bytes read and written and
+its peak memory: the most the resident memory of the process grew above
+what it was when the stage started, sampled every SAMPLE_INTERVAL seconds
+by a background thread (where the current resident memory is unknown, the
+growth of its peak). No allocation is traced, so the stages take as long
+as they do without --profile. The peak resident memory of the whole
+process is reported once at the end. The trace is JSON in the Chrome
+trace event format (chrome://tracing, Perfetto).
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+ENV_VAR = 'ACAP_PROFILE'
+SAMPLE_INTERVAL = 0.005  # Seconds between samples of the resident memory of the running stages
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def peak_memory():
+    '''
+    Peak resident memory of this process in bytes (None if unknown).
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak*1024
+
+
+def resident_memory():
+    '''
+    Resident memory of this process in bytes, or its peak where the
+    current value is unknown (None if neither is known).
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_memory()
+
+
+class Profiler():
+    def __init__(self):
+        self.enabled = False
+        self.trace = None  # File the trace events are written to
+        self.stats = {}  # Totals of each stage, in the order first seen
+        self.events = []
+        self.active = []  # Stages currently running, innermost last, with their memory at the start and peak
+        self.sampler = None  # Thread sampling the resident memory while enabled
+        self.start = time.perf_counter()
+
+    def enable(self, trace=None):
+        self.enabled = True
+        self.trace = trace
+        self.start = time.perf_counter()
+        if self.sampler is None and resident_memory() is not None:
+            self.sampler = threading.Thread(target=self.sample, daemon=True)
+            self.sampler.start()
+
+    def sample(self):
+        while self.enabled:
+            self.update_peaks()
+            time.sleep(SAMPLE_INTERVAL)
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._stage(name)
+
+    @contextlib.contextmanager
+    def _stage(self, name):
+        stats = self.stats.setdefault(name, {'calls': 0, 'seconds': 0.0, 'files': 0,
+                                             'bytes_read': 0, 'bytes_written': 0, 'peak_memory': 0})
+        current = resident_memory() or 0
+        frame = {'stats': stats, 'start': current, 'peak': current}
+        self.active.append(frame)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - start
+            self.update_peaks()
+            self.active.pop()
+            stats['calls'] += 1
+            stats['seconds'] += elapsed
+            stats['peak_memory'] = max(stats['peak_memory'], frame['peak'] - frame['start'])
+            self.events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                                'ts': (start - self.start)*1e6, 'dur': elapsed*1e6})
+
+    def update_peaks(self):
+        '''
+        Fold the resident memory into every running stage, so nested stages
+        each keep their own peak.
+        '''
+        current = resident_memory() or 0
+        for frame in list(self.active):
+            frame['peak'] = max(frame['peak'], current)
+
+    def add(self, files=0, bytes_read=0, bytes_written=0):
+        '''
+        Add counts to the innermost running stage.
+        '''
+        if not self.active:
+            return
+        stats = self.active[-1]['stats']
+        stats['files'] += files
+        stats['bytes_read'] += bytes_read
+        stats['bytes_written'] += bytes_written
+
+    def add_file(self, filepath):
+        '''
+        Count a file just written by the innermost running stage.
+        '''
+        if self.active:
+            self.add(files=1, bytes_written=os.path.getsize(filepath))
+
+    def summary(self):
+        lines = ['%-14s %6s %10s %7s %12s %12s %10s' % ('stage', 'calls', 'seconds', 'files',
+                                                       'read (MB)', 'written (MB)', 'peak (MB)')]
+        for name, stats in self.stats.items():
+            lines.append('%-14s %6d %10.3f %7d %12.2f %12.2f %10.1f' % (
+                name, stats['calls'], stats['seconds'], stats['files'],
+                stats['bytes_read']/1e6, stats['bytes_written']/1e6, stats['peak_memory']/1e6))
+        process = peak_memory()
+        if process is not None:
+            lines.append('Peak resident memory of the process: %.1f MB' % (process/1e6))
+        return '\n'.join(lines)
+
+    def write_trace(self, filepath):
+        events = list(self.events)
+        for name, stats in self.stats.items():
+            events.append({'name': name, 'ph': 'C', 'pid': os.getpid(), 'tid': 0,
+                           'ts': (time.perf_counter() - self.start)*1e6,
+                           'args': {'files': stats['files'], 'bytes_read': stats['bytes_read'],
+                                    'bytes_written': stats['bytes_written']}})
+        with open(filepath, 'w') as f:
+            json.dump({'traceEvents': events, 'stages': self.stats}, f)
+
+    def report(self):
+        '''
+        Print the summary and write the trace, if enabled.
+        '''
+        if not self.enabled or not self.stats:
+            return
+        print('\n' + self.summary())
+        if self.trace:
+            self.write_trace(self.trace)
+            print('Trace saved - ' + self.trace)
+
+
+# Shared by every module, so all stages of a run end up in one summary
+PROFILER = Profiler()
+
+
+def enable_from(option=None):
+    '''
+    Switch the profiler on from the --profile option or ACAP_PROFILE.
+    The value '1' (or True) only prints the summary; any other value is the
+    trace file to write.
+    '''
+    value = option if option is not None else os.environ.get(ENV_VAR)
+    if value in (None, '', '0', False):
+        return PROFILER
+    trace = None if value in ('1', True) else value
+    PROFILER.enable(trace)
+    return PROFILER
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Answers to the console prompts of acap_3.py.
+
+By default every prompt is answered by the user. A job file or --job
+arguments instead supply the answers for any number of DATE/TARGET jobs,
+which are then run back to back without any interaction.
+
+A job file is JSON, e.g.
+
+    {"root": "/data/ClassicData/",
+     "processes": 4,
+     "dpi": 300,
+     "defaults": {"mode": "single", "xscale": "f", "noise": true},
+     "jobs": [{"date": "17-03-2021", "target": "W51"},
+              {"date": "18-03-2021", "target": "W51", "f_lower": -2000, "f_upper": 2000}]}
+
+Job keys match the prompts: mode (single/enlarged/solar), save_graphs,
+save_files, target, date, f_lower, f_upper, yscale, gain, offset, xscale,
+f_step, receiver, azimuth, altitude, galactic_longitude,
+galactic_latitude, noise and noise_profile (a saved noise profile to
+reuse). Single spectra also take fit_lines (a Gaussian fit of every
+scan's line, see acap/lines.py) and waterfall and waterfall_step (a time
+x frequency image of the night with waterfall_step scans averaged into
+each row, see acap/waterfall.py). Enlarged mode takes en_f_lower and
+en_f_upper (comma-separated for several windows, e.g. "-1600,200" and
+"-600,600"), tick_lower, tick_upper and tick_step.
+
+The run options root, processes, dpi, format, outputs, watch, interval,
+profile, archive, threads, flags, memory, preview and export apply to
+every job and can also be given on the command line.
+"""
+
+import json
+import argparse
+
+# (singlegraphs, enlarged, solarcal) answers for each analysis mode
+MODES = {'single': (1, 0, 0), 'enlarged': (1, 1, 0), 'solar': (0, 0, 1)}
+MODE_KEYS = ('singlegraphs', 'enlarged', 'solarcal')
+
+DEFAULTS = {'mode': 'single', 'save_graphs': 1, 'save_files': 1,
+            'f_lower': -1000, 'f_upper': 1000, 'yscale': 'v', 'xscale': 'f',
+            'noise': 'N', 'noise_profile': '', 'fit_lines': 'N',
+            'waterfall': 'N', 'waterfall_step': 1}
+
+# Answers given for true/false values, the default being ('1', '0')
+BOOLEAN_ANSWERS = {'noise': ('Y', 'N'), 'fit_lines': ('Y', 'N'), 'waterfall': ('Y', 'N')}
+
+# Settings of the whole run rather than of a single job
+OPTIONS = ('root', 'processes', 'dpi', 'format', 'outputs', 'watch', 'interval', 'profile', 'archive',
+           'threads', 'flags', 'memory', 'preview', 'export')
+
+
+class ConsoleAnswers():
+    '''
+    Prompts are answered by the user, as in the original console flow.
+    '''
+    headless = False
+
+    def __init__(self, options=None):
+        self.options = options or {}
+
+    def ask(self, key, prompt):
+        return input(prompt)
+
+
+class JobAnswers():
+    '''
+    Prompts are answered from a list of jobs. The final 'another' prompt
+    moves on to the next job and stops once all jobs have run.
+    '''
+    headless = True
+
+    def __init__(self, jobs, defaults=None, options=None):
+        base = dict(DEFAULTS, **(defaults or {}))
+        self.defaults = base
+        self.jobs = [dict(base, **job) for job in jobs]
+        self.index = 0
+        self.options = options or {}
+
+    def ask(self, key, prompt):
+        if key == 'another':
+            self.index += 1
+            answer = 'Y' if self.index < len(self.jobs) else 'N'
+        else:
+            answer = self.answer(key)
+        print(prompt+answer)
+        return answer
+
+    def answer(self, key):
+        job = self.jobs[self.index]
+        if key in MODE_KEYS:
+            if job['mode'] not in MODES:
+                raise ValueError('Unknown mode '+repr(job['mode'])+' in job '+str(self.index+1))
+            return str(MODES[job['mode']][MODE_KEYS.index(key)])
+        if key not in job:
+            raise KeyError('Job '+str(self.index+1)+' ('+str(job.get('target'))+' '
+                           +str(job.get('date'))+') is missing '+repr(key))
+        value = job[key]
+        if isinstance(value, bool):
+            value = BOOLEAN_ANSWERS.get(key, ('1', '0'))[0 if value else 1]
+        return str(value)
+
+
+def parse_pairs(pairs):
+    job = {}
+    for pair in pairs:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise ValueError('Expected KEY=VALUE, got '+repr(pair))
+        job[key] = value
+    return job
+
+
+def load_job_file(filepath):
+    with open(filepath) as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        config = {'jobs': config}
+    return config
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Analysis of SpectraCyber spectra and Solar calibration scans. '
+                    'Without --jobs or --job every setting is asked for at the console.')
+    parser.add_argument('--jobs', metavar='FILE',
+                        help='JSON job file listing the DATE/TARGET jobs to run')
+    parser.add_argument('--job', nargs='+', action='append', default=[], metavar='KEY=VALUE',
+                        help='Run one job with these settings (may be repeated)')
+    parser.add_argument('--set', nargs='+', default=[], metavar='KEY=VALUE',
+                        help='Settings shared by every job')
+    parser.add_argument('--root', help='ClassicData directory holding the DATE/TARGET folders')
+    parser.add_argument('--processes', type=int,
+                        help='Worker processes used to render single spectra')
+    parser.add_argument('--dpi', type=int, help='Resolution of saved plots')
+    parser.add_argument('--format', help='File format of saved plots (e.g. png, pdf, svg)')
+    parser.add_argument('--outputs', metavar='KINDS',
+                        help='Processed data outputs, comma-separated: txt (one file per scan), '
+                             'npz and bin (one file per night)')
+    parser.add_argument('--watch', action='store_true', default=None,
+                        help='Keep processing new scans as they arrive in Raw Data (Ctrl+C to stop)')
+    parser.add_argument('--interval', type=float, help='Seconds between checks for new scans when watching')
+    parser.add_argument('--threads', type=int,
+                        help='Threads reading scans ahead of the processing, while plots and data are saved '
+                             'behind it (headless single spectra only)')
+    parser.add_argument('--memory', type=float, metavar='MB',
+                        help='Process each night in chunks of scans using at most about this much memory')
+    parser.add_argument('--flags', action='store_true', default=None,
+                        help='Flag saturated data points and single-bin RFI spikes and leave them out '
+                             'of the results')
+    parser.add_argument('--no-flags', dest='flags', action='store_false', default=None,
+                        help='Keep every data point (the default), overriding flags in a job file')
+    parser.add_argument('--archive', action='store_true', default=None,
+                        help='Summarise the Solar calibration and noise of every DATE/TARGET under the root '
+                             '(window from --set f_lower=... f_upper=... f_step=...)')
+    parser.add_argument('--preview', action='store_true', default=None,
+                        help='Save quick low-resolution plots and a contact sheet of every scan, '
+                             'keeping a render cache for --export')
+    parser.add_argument('--export', metavar='SCANS',
+                        help='Render only these scans at --dpi from the render cache of a preview run, '
+                             'e.g. 3,5-9 (scan numbers) or 21:05-21:10 (UTC)')
+    parser.add_argument('--profile', nargs='?', const='1', metavar='TRACE',
+                        help='Print the time spent in each processing stage, and write a trace '
+                             'to TRACE if given (or set the ACAP_PROFILE environment variable)')
+    return parser.parse_args(argv)
+
+
+def answers_from_args(args):
+    '''
+    Return JobAnswers for the jobs given on the command line, or
+    ConsoleAnswers when none are given.
+    '''
+    config = {}
+    if args.jobs:
+        config = load_job_file(args.jobs)
+    jobs = list(config.get('jobs', [])) + [parse_pairs(pairs) for pairs in args.job]
+    options = {}
+    for key in OPTIONS:
+        value = getattr(args, key)
+        if value is None:
+            value = config.get(key)
+        if value is not None:
+            options[key] = value
+    if not args.jobs and not args.job and not args.archive:
+        return ConsoleAnswers(options)
+    defaults = dict(config.get('defaults', {}), **parse_pairs(args.set))
+    return JobAnswers(jobs, defaults, options)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Gaussian line measurements of noise-corrected spectra.
+
+The strongest line of every scan and channel is located and fitted with a
+Gaussian on a constant baseline. Initial guesses are taken from all
+spectra at once, and every fit is iterated together (a batched
+Levenberg-Marquardt least-squares fit in numpy), so a whole night is
+measured in a fraction of a second. The x-axis is the one the spectra are
+plotted on (frequency in kHz or LSR velocity in km/s), so centres and
+widths are in the same units.
+"""
+
+import warnings
+
+import numpy as np
+
+FIT_HALF_WIDTH = 20  # Data points either side of the peak used in the fit
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-8  # Relative change of the squared residuals at which a fit has converged
+FWHM_PER_SIGMA = 2*np.sqrt(2*np.log(2))
+COLUMNS = ('scan', 'time', 'channel', 'amplitude', 'centre', 'fwhm', 'integrated', 'baseline', 'rms', 'converged')
+
+
+def gaussian(x, amplitude, centre, sigma, baseline):
+    return baseline + amplitude*np.exp(-0.5*((x-centre)/sigma)**2)
+
+
+def fit_windows(y, lower=None, upper=None, half_width=FIT_HALF_WIDTH):
+    '''
+    Index of the highest data point of each row of y within lower:upper,
+    and the (rows x 2*half_width+1) indices of the data points around it,
+    with -1 for those outside lower:upper.
+    '''
+    lower = 0 if lower is None else lower
+    upper = y.shape[1] if upper is None else min(upper, y.shape[1])
+    search = np.full(y.shape, -np.inf)
+    search[:, lower:upper] = np.where(np.isfinite(y[:, lower:upper]), y[:, lower:upper], -np.inf)
+    peak = np.argmax(search, axis=1)
+    window = peak[:, np.newaxis] + np.arange(-half_width, half_width+1)
+    window[(window < lower) | (window >= upper)] = -1
+    return peak, window
+
+
+def initial_guesses(x, y):
+    '''
+    (amplitude, centre, sigma, baseline) of the highest peak of each row
+    of y on the axis x (rows x points), NaN data points being ignored.
+    '''
+    with warnings.catch_warnings():
+        # Rows with no data left have NaN guesses and are not fitted
+        warnings.simplefilter('ignore', RuntimeWarning)
+        baseline = np.nanmedian(y, axis=1)
+        peak = np.argmax(np.where(np.isfinite(y), y, -np.inf), axis=1)
+        rows = np.arange(len(y))
+        amplitude = y[rows, peak] - baseline
+        # Width from the data points above half the peak
+        above = np.count_nonzero(y - baseline[:, np.newaxis] > amplitude[:, np.newaxis]/2, axis=1)
+        step = np.nanmedian(np.abs(np.diff(x, axis=1)), axis=1)
+    sigma = np.maximum(above, 1)*step/FWHM_PER_SIGMA
+    return np.stack([amplitude, x[rows, peak], sigma, baseline], axis=1)
+
+
+def fit_gaussians(x, y, iterations=MAX_ITERATIONS):
+    '''
+    Least-squares Gaussian fits to every row of y on the axis x (rows x
+    points) at once, NaN data points being left out. Returns the (rows x 4)
+    parameters (amplitude, centre, sigma, baseline), the rms residual and
+    whether each fit converged.
+    '''
+    weights = np.isfinite(y) & np.isfinite(x)
+    x = np.where(weights, x, 0)
+    y = np.where(weights, y, 0)
+    params = initial_guesses(np.where(weights, x, np.nan), np.where(weights, y, np.nan))
+    valid = np.isfinite(params).all(axis=1) & (params[:, 2] > 0) & (weights.sum(axis=1) > 4)
+    params[~valid] = [0, 0, 1, 0]
+
+    def residuals(p):
+        return (y - gaussian(x, *[p[:, [k]] for k in range(4)]))*weights
+
+    cost = np.sum(residuals(params)**2, axis=1)
+    # Smallest squared residuals told apart from 0, for fits to noiseless data
+    floor = np.maximum(1e-24*np.sum(y*y, axis=1), 1e-300)
+    damping = np.full(len(y), 1e-3)
+    converged = ~valid
+    stationary = ~valid
+    for iteration in range(iterations):
+        amplitude, centre, sigma = params[:, [0]], params[:, [1]], params[:, [2]]
+        z = (x - centre)/sigma
+        e = np.exp(-0.5*z*z)
+        # Derivatives of the model by amplitude, centre, sigma and baseline
+        jacobian = np.stack([e, amplitude*e*z/sigma, amplitude*e*z*z/sigma, np.ones_like(e)], axis=2)*weights[..., np.newaxis]
+        r = residuals(params)
+        jtj = np.einsum('nwi,nwj->nij', jacobian, jacobian)
+        jtr = np.einsum('nwi,nw->ni', jacobian, r)
+        diagonal = np.einsum('nii->ni', jtj)
+        # Decrease of the squared residuals a Gauss-Newton step would bring
+        gain = np.einsum('ni,ni->n', jtr, np.linalg.solve(
+            jtj + (1e-9*(diagonal + 1e-12))[:, :, np.newaxis]*np.eye(4), jtr[..., np.newaxis])[..., 0])
+        stationary = np.where(converged, stationary, gain <= TOLERANCE*np.maximum(cost, floor))
+        lhs = jtj + (damping[:, np.newaxis]*(diagonal + 1e-12))[:, :, np.newaxis]*np.eye(4)
+        step = np.linalg.solve(lhs, jtr[..., np.newaxis])[..., 0]
+        trial = params + step
+        trial_cost = np.sum(residuals(trial)**2, axis=1)
+        better = (trial_cost < cost) & ~converged & np.isfinite(trial_cost)
+        change = np.abs(cost - trial_cost) <= TOLERANCE*np.maximum(cost, floor)
+        params[better] = trial[better]
+        converged |= better & change
+        cost = np.where(better, trial_cost, cost)
+        damping = np.where(converged, damping, np.where(better, damping/10, damping*10))
+        # A fit whose damping has grown this large can no longer improve; it
+        # has converged if it stopped at a minimum of the squared residuals
+        converged |= damping > 1e10
+        if converged.all():
+            break
+    params[:, 2] = np.abs(params[:, 2])
+    rms = np.sqrt(cost/np.maximum(weights.sum(axis=1), 1))
+    params[~valid] = np.nan
+    rms[~valid] = np.nan
+    return params, rms, valid & ((converged & (damping <= 1e10)) | stationary)
+
+
+def measure_lines(corrected, axes, lower=None, upper=None, half_width=FIT_HALF_WIDTH):
+    '''
+    Fit the strongest line within the data points lower:upper of every
+    scan and channel of corrected (scans x bins x channels), axes being the
+    x-axis of each scan (scans x bins). Returns a dict of (scans x
+    channels) arrays: amplitude, centre, fwhm, integrated (the area of the
+    line above the baseline), baseline, rms and converged. A fit whose
+    centre falls outside its window is not converged.
+    '''
+    scans, bins, channels = corrected.shape
+    y = np.moveaxis(corrected, 2, 1).reshape(scans*channels, bins)
+    x = np.repeat(np.asarray(axes, dtype=np.float64), channels, axis=0)
+    peak, window = fit_windows(y, lower, upper, half_width)
+    rows = np.arange(len(y))[:, np.newaxis]
+    inside = window >= 0
+    windowx = np.where(inside, x[rows, np.maximum(window, 0)], np.nan)
+    windowy = np.where(inside, y[rows, np.maximum(window, 0)], np.nan)
+    params, rms, converged = fit_gaussians(windowx, windowy)
+    amplitude, centre, sigma, baseline = params.T
+    with np.errstate(invalid='ignore'):
+        converged &= (centre >= np.nanmin(windowx, axis=1)) & (centre <= np.nanmax(windowx, axis=1))
+    results = {'amplitude': amplitude, 'centre': centre, 'fwhm': sigma*FWHM_PER_SIGMA,
+               'integrated': amplitude*sigma*np.sqrt(2*np.pi), 'baseline': baseline, 'rms': rms,
+               'converged': converged}
+    return {key: value.reshape(scans, channels) for key, value in results.items()}
+
+
+def save_table(filepath, rows, xlabel=''):
+    '''
+    Write the fits (a list of dicts with the COLUMNS) as comma-separated
+    values, one row per scan and channel.
+    '''
+    with open(filepath, 'w') as f:
+        f.write('# x axis: '+xlabel+'\n')
+        f.write(','.join(COLUMNS)+'\n')
+        for row in rows:
+            values = []
+            for key in COLUMNS:
+                value = row[key]
+                if isinstance(value, float):
+                    value = '%.6f' % value
+                values.append(str(value))
+            f.write(','.join(values)+'\n')
+
+
+def table_rows(fits, first, times):
+    '''
+    Rows of save_table for the fits of scans first+1, first+2, ... taken
+    at times.
+    '''
+    rows = []
+    for k in range(fits['amplitude'].shape[0]):
+        for i in range(fits['amplitude'].shape[1]):
+            row = {'scan': first+k+1, 'time': str(times[k]), 'channel': i+1,
+                   'converged': int(fits['converged'][k, i])}
+            for key in ('amplitude', 'centre', 'fwhm', 'integrated', 'baseline', 'rms'):
+                row[key] = float(fits[key][k, i])
+            rows.append(row)
+    return rows
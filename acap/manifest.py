@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Manifest of the scan files in a Raw Data or Noise folder.
+
+The manifest records the scan number, header time, channel count, size and
+mtime of every file. It is kept in a JSON file outside the data folder and
+refreshed incrementally: only new or changed files have their header read,
+and the raw files themselves are never renamed or modified.
+"""
+
+import os
+import json
+
+import numpy as np
+
+from acap.spectrum import Spectrum, scan_sort_key, scan_time
+from acap import sources
+
+
+def read_scan_info(filepath):
+    '''
+    Header time and channel count of a scan, from its first two lines only.
+    '''
+    with sources.open_file(filepath) as f:
+        header = f.readline().decode('ascii').strip('\r\n').strip(Spectrum.DELIMITER)
+        first_row = f.readline()
+    return scan_time(np.array([header])), len(first_row.split())
+
+
+class ScanIndex():
+    def __init__(self, directory, manifestpath):
+        self.directory = directory
+        self.manifestpath = manifestpath
+        self.entries = {}
+        try:
+            with open(manifestpath) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.files = []
+        self.times = np.array([], dtype='datetime64[s]')
+
+    def refresh(self):
+        '''
+        Bring the manifest up to date with the folder and return the scan
+        filenames in scan order.
+        '''
+        changed = False
+        present = {}
+        # The folder may also be inside a .zip or .tar archive (see acap/sources.py)
+        for name in sources.listdir(self.directory):
+            filepath = os.path.join(self.directory, name)
+            stat = sources.stat(filepath)
+            entry = self.entries.get(name)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+                scantime, channels = read_scan_info(filepath)
+                entry = {'scan': scan_sort_key(name)[1], 'time': str(scantime),
+                         'channels': channels, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+                changed = True
+            present[name] = entry
+        if changed or len(present) != len(self.entries):
+            self.entries = present
+            self.save()
+        self.files = sorted(self.entries, key=scan_sort_key)
+        self.times = np.array([self.entries[f]['time'] for f in self.files], dtype='datetime64[s]')
+        return self.files
+
+    def save(self):
+        directory = os.path.dirname(self.manifestpath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.manifestpath+'.tmp', 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(self.manifestpath+'.tmp', self.manifestpath)
+
+    def __getitem__(self, filename):
+        return self.entries[filename]
+
+    def select(self, start=None, end=None):
+        '''
+        Filenames (in scan order) of the scans recorded between start and
+        end inclusive, given as numpy datetime64 values or ISO strings.
+        '''
+        keep = np.ones(len(self.files), dtype=bool)
+        if start is not None:
+            keep &= self.times >= np.datetime64(start, 's')
+        if end is not None:
+            keep &= self.times <= np.datetime64(end, 's')
+        return [f for f, k in zip(self.files, keep) if k]
+
+    def sources(self):
+        '''
+        [filename, size, mtime] of every scan, in scan order.
+        '''
+        return [[f, self.entries[f]['size'], self.entries[f]['mtime']] for f in self.files]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming noise profile built from the off-target (noise) scans.
+"""
+
+import json
+
+import numpy as np
+
+
+class NoiseProfile():
+    '''
+    Running per-bin mean and variance of the noise scans (Welford's method).
+    The shape (bins x channels) is taken from the first scan added.
+
+    Flagged data points (see acap/flags.py) are left out, so counts holds
+    the number of scans averaged in each bin; bins flagged in every scan
+    have a NaN mean. flagging holds the flag settings used and flags their
+    summary, so a saved profile is only reused with the same settings.
+    '''
+
+    def __init__(self, sources=None, flagging=None):
+        self.count = 0
+        self.counts = None  # Scans averaged in each bin and channel
+        self.mean = None
+        self.m2 = None  # Sum of squared differences from the mean
+        self.sources = sources if sources is not None else []
+        self.flagging = flagging
+        self.flags = None
+
+    def add(self, data, mask=None):
+        data = np.asarray(data, dtype=np.float64)
+        if self.mean is None:
+            self.mean = np.zeros(data.shape, dtype=np.float64)
+            self.m2 = np.zeros(data.shape, dtype=np.float64)
+            self.counts = np.zeros(data.shape, dtype=np.int64)
+        elif data.shape != self.mean.shape:
+            raise ValueError('Noise scan has shape '+str(data.shape)+', expected '+str(self.mean.shape))
+        self.count += 1
+        empty = self.counts == 0
+        if self.count > 1 and empty.any():
+            self.mean[empty] = 0
+        if mask is None or not mask.any():
+            self.counts += 1
+            delta = data - self.mean
+            self.mean += delta / self.counts
+            self.m2 += delta * (data - self.mean)
+        else:
+            keep = ~mask
+            self.counts += keep
+            delta = np.where(keep, data - self.mean, 0)
+            self.mean += delta / np.maximum(self.counts, 1)
+            self.m2 += delta * (data - self.mean)
+            self.mean[self.counts == 0] = np.nan
+
+    @property
+    def variance(self):
+        '''
+        Sample variance of each bin and channel.
+        '''
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        if (self.counts == self.count).all():
+            return self.m2 / (self.count - 1)
+        variance = np.divide(self.m2, self.counts - 1, out=np.zeros_like(self.m2), where=self.counts > 1)
+        variance[self.counts == 0] = np.nan
+        return variance
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def window_stats(self, lower, upper):
+        '''
+        Mean noise level and mean standard deviation over the data points
+        lower to upper, both included, as for the console's frequency range.
+        Bins flagged in every noise scan have no noise level and are left out.
+        '''
+        window = slice(lower, upper+1)
+        return np.nanmean(self.mean[window], dtype=np.float64), np.nanmean(self.std[window])
+
+    def save(self, filepath):
+        if self.mean is None:
+            raise ValueError('No noise scans were added to the profile, so it cannot be saved')
+        np.savez(filepath, count=self.count, counts=self.counts, mean=self.mean, m2=self.m2,
+                 sources=np.array(json.dumps(self.sources)),
+                 flagging=np.array(json.dumps(self.flagging)), flags=np.array(json.dumps(self.flags)))
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath) as f:
+            profile = cls(json.loads(str(f['sources'])))
+            profile.count = int(f['count'])
+            profile.mean = f['mean']
+            profile.m2 = f['m2']
+            # Profiles saved before flagging averaged every scan in every bin
+            profile.counts = f['counts'] if 'counts' in f else np.full(profile.mean.shape, profile.count)
+            if 'flagging' in f:
+                profile.flagging = json.loads(str(f['flagging']))
+                profile.flags = json.loads(str(f['flags']))
+        return profile
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Overlapped reading, processing and saving of scans.
+
+read_ahead parses the next scans on reader threads while the current one
+is processed, and WriteBehind saves figures and processed data on writer
+threads. matplotlib does not promise thread safety, so figures should be
+drawn by a single WriteBehind thread. Both hold a bounded number of
+scans, so memory stays capped however long the night is, and scans come
+out in their original order.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from acap.spectrum import Spectrum, parse_spectrum
+from acap.sources import open_file
+
+DEPTH = 8  # Scans held by each stage at most
+
+
+def read_ahead(filepaths, cache=None, threads=2, depth=DEPTH):
+    '''
+    Yield (filepath, header, data) for every scan in order, with up to
+    depth scans being read ahead on threads. Newly parsed scans are added
+    to the cache.
+    '''
+    lock = threading.Lock()  # The scan cache is not thread-safe
+
+    def read(filepath):
+        cached = None
+        if cache is not None:
+            with lock:
+                cached = cache.get(filepath)
+        if cached is not None:
+            return cached
+        with open_file(filepath) as f:
+            header, data = parse_spectrum(f.read(), Spectrum.HEADER_LENGTH, Spectrum.DELIMITER)
+        if cache is not None:
+            with lock:
+                cache.put(filepath, header, data)
+        return header, data
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = []
+        k = 0
+        while k < len(filepaths) or pending:
+            while k < len(filepaths) and len(pending) < depth:
+                pending.append((filepaths[k], pool.submit(read, filepaths[k])))
+                k += 1
+            filepath, future = pending.pop(0)
+            header, data = future.result()
+            yield filepath, header, data
+
+
+class WriteBehind():
+    '''
+    Runs submitted calls on background threads. submit blocks while depth
+    calls are waiting, and with a single thread calls run in the order
+    submitted. The first error raised by a call is raised again by submit
+    or close.
+    '''
+
+    def __init__(self, threads=1, depth=DEPTH):
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.threads = [threading.Thread(target=self.work, daemon=True) for k in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            function, args = job
+            if self.error is None:
+                try:
+                    function(*args)
+                except Exception as e:
+                    self.error = e
+
+    def submit(self, function, *args):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((function, args))
+
+    def close(self):
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            # Stop the threads but keep the original error
+            self.error = self.error or exc[1]
+            for thread in self.threads:
+                self.queue.put(None)
+
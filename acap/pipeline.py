@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Processing of one DATE/TARGET night without the console prompts.
+
+    from acap.pipeline import Night
+    from acap.solarcal import SolarCalibration
+
+    night = Night('/data/ClassicData/', '17-03-2021', 'W51')
+    cube = night.load()
+    noise = night.noise_profile()
+    corrected = cube.corrected(noise.mean)
+    solarcal = SolarCalibration(cube, 100, 300)
+    night.render(cube, corrected, xscale, xticks, 'Doppler-shifted frequency (kHz)')
+
+Nothing in this module imports matplotlib until render is called.
+"""
+
+import os
+
+import numpy as np
+
+from acap.cache import ScanCache, DEFAULT_MAX_BYTES
+from acap.cube import ScanCube, WORKING_COPIES, FLAGGED_COPIES
+from acap.noise import NoiseProfile
+from acap.manifest import ScanIndex
+from acap.spectrum import Spectrum, scan_labels
+from acap.sources import outside_archive, archive_folder
+from acap.flags import masked
+from acap.instrument import PROFILER
+
+
+def timezone_for(date):
+    '''
+    'BST' or 'GMT' for a DD-MM-YYYY date: BST from the 28th of March to
+    the end of October.
+    '''
+    date_info = date.split('-')
+    if int(date_info[1]) >= 4 and int(date_info[1]) <= 10:
+        return 'BST'
+    if int(date_info[1]) == 3 and int(date_info[0]) >= 28:
+        return 'BST'
+    return 'GMT'
+
+
+class Night():
+    '''
+    Folders, scan cache and scan list of root/DATE/TARGET.
+
+    DATE may run through an archive, e.g. '17-03-2021.tar.gz'. The scans
+    are then read from the archive and the outputs, cache and noise
+    profile are kept in a 17-03-2021 folder next to it.
+    '''
+
+    def __init__(self, root, date, target, cache_size=DEFAULT_MAX_BYTES):
+        self.date = date
+        self.target = target
+        self.timezone = timezone_for(date)
+        # An archive of the DATE folder itself is entered, e.g. 17-03-2021.tar.gz holding 17-03-2021/
+        base = os.path.join(archive_folder(os.path.join(root, '')+date), '')+target+'/'
+        self.path = base+'Raw Data/'
+        self.noisepath = base+'Noise/'
+        base = outside_archive(base)
+        self.processedpath = base+'Processed Data/'
+        self.plotpath = base+'Plots/'
+        self.enplotpath = base+'EnlargedPlots/'
+        # The averaged noise profile is saved here and can be reused by other targets
+        self.noiseprofilepath = base+'Noise profile.npz'
+        # Parsed scans are cached here so that reruns of the same night skip the text parsing
+        self.cachepath = base+'Cache/'
+        self.cache = ScanCache(self.cachepath, max_bytes=cache_size)
+        self.index = ScanIndex(self.path, self.cachepath+'Raw Data manifest.json')
+        self.files = []
+
+    def makedirs(self):
+        '''
+        Create the output folders, returning those that were missing.
+        '''
+        created = []
+        for directory in (self.processedpath, self.plotpath, self.enplotpath):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+                created.append(directory)
+        return created
+
+    def refresh(self):
+        '''
+        Update the list of raw scans, in scan number order.
+        '''
+        self.files = self.index.refresh()
+        return self.files
+
+    @property
+    def filepaths(self):
+        return [self.path+x for x in self.files]
+
+    @property
+    def times(self):
+        return self.index.times
+
+    def load(self):
+        '''
+        Every raw scan as one ScanCube, using the scan cache.
+        '''
+        if not self.files:
+            self.refresh()
+        return ScanCube.load(self.filepaths, cache=self.cache)
+
+    def chunks(self, max_bytes=None, noisedata=None, offset=0, flagger=None, count=True):
+        '''
+        Yield (first, cube, corrected, mask) for pieces of the night that
+        fit within max_bytes (the whole night when None), first being the
+        index of the piece's first scan. Each piece is flagged with flagger
+        (see acap/flags.py, count=False when its scans were already
+        counted) and noise-corrected when noisedata is given.
+        '''
+        if not self.files:
+            self.refresh()
+        copies = WORKING_COPIES if flagger is None else FLAGGED_COPIES
+        for first, cube in ScanCube.chunks(self.filepaths, max_bytes, self.cache, copies):
+            mask = None
+            if flagger is not None:
+                with PROFILER.stage('flag'):
+                    mask = flagger.flag(cube.data, count)
+            if noisedata is not None:
+                with PROFILER.stage('correct'):
+                    corrected = cube.corrected(noisedata, offset, mask=mask)
+            else:
+                corrected = masked(cube.data, mask)
+            yield first, cube, corrected, mask
+
+    def noise_profile(self, reuse=True, callback=None, flagger=None):
+        '''
+        NoiseProfile of the Noise folder. The saved profile is reused while
+        the noise files and flag settings are unchanged; otherwise it is
+        built again and saved. callback(filename, spectrum, mask) is called
+        for each noise scan read. With a ScanFlagger (see acap/flags.py),
+        flagged data points are left out of the average. Raises
+        FileNotFoundError when the Noise folder holds no scans.
+        '''
+        noiseindex = ScanIndex(self.noisepath, self.cachepath+'Noise manifest.json')
+        noisefiles = noiseindex.refresh()
+        if not noisefiles:
+            raise FileNotFoundError('No noise scans in '+self.noisepath)
+        sources = noiseindex.sources()
+        flagging = flagger.settings if flagger is not None else None
+        if reuse and os.path.exists(self.noiseprofilepath):
+            try:
+                noiseprofile = NoiseProfile.load(self.noiseprofilepath)
+            except (OSError, ValueError, KeyError):
+                # An unreadable profile (e.g. the empty one saved by earlier versions) is built again
+                noiseprofile = None
+            if noiseprofile is not None and noiseprofile.sources == sources and noiseprofile.flagging == flagging:
+                return noiseprofile
+        noiseprofile = NoiseProfile(sources, flagging)
+        for x in noisefiles:
+            noiseplot = Spectrum(self.noisepath+x, cache=self.cache)
+            mask = flagger.flag(noiseplot.data) if flagger is not None else None
+            noiseprofile.add(noiseplot.data, mask)
+            if callback is not None:
+                callback(x, noiseplot, mask)
+        if flagger is not None:
+            noiseprofile.flags = flagger.summary()
+        noiseprofile.save(self.noiseprofilepath)
+        return noiseprofile
+
+    def render(self, cube, corrected, xscale, xticks, xlabel, ylabel='Intensity (Volts)',
+               noisedata=None, offset=0, alpha=1, dpi=1000, fmt='png', shifts=None):
+        '''
+        Save the single spectrum plot of every scan in cube to the Plots
+        folder and return the filenames. shifts optionally moves each scan's
+        x-axis by its own velocity shift.
+        '''
+        from acap.render import SpectrumRenderer
+        renderer = SpectrumRenderer(xscale, xticks, xlabel, ylabel, cube.num_channels, noisedata,
+                                    offset, alpha, dpi, fmt)
+        filenames = []
+        for k in range(len(cube)):
+            title, filename = scan_labels(cube.headers[k], self.target, k+1, self.timezone)
+            scanxscale = xscale if shifts is None else xscale + shifts[k]
+            renderer.render(title, cube.data[k], corrected[k] if noisedata is not None else None,
+                            self.plotpath+filename, scanxscale)
+            filenames.append(filename)
+        return filenames
+
+
+def tick_shift(velocity_shift):
+    '''
+    Amount the velocity axis ticks are moved by for a velocity shift, so
+    they stay on round numbers.
+    '''
+    shift = int(np.floor(velocity_shift / 10))*10
+    remainder = velocity_shift % 10
+    if remainder < 5:
+        shift += 5
+    elif remainder > 5:
+        shift += 10
+    return shift
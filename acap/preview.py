@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Quick-look previews of a night and high-resolution exports of chosen scans.
+
+A preview run saves a contact sheet of every scan as small thumbnails and
+a render cache holding what each plot is drawn from (raw and corrected
+spectra, x-axes, titles and the plot settings). Chosen scans are later
+rendered at full resolution from the render cache alone, so no raw file
+is read or parsed again.
+"""
+
+import os
+import json
+
+import numpy as np
+
+from acap.instrument import PROFILER
+
+PREVIEW_DPI = 100  # Resolution of the saved plots and contact sheets of a preview run
+SHEET_COLUMNS = 10  # Thumbnails across and down each contact sheet
+SHEET_ROWS = 10
+RENDER_CACHE_NAME = 'Render cache'
+
+
+class RenderCache():
+    '''
+    Appends the raw data, corrected data and x-axis of each scan (bins x
+    2*channels+1) to filepath.f64, and keeps the plot settings, titles,
+    filenames and scan times in filepath.json, written on close.
+    '''
+
+    def __init__(self, filepath, settings):
+        self.datapath = filepath+'.f64'
+        self.metapath = filepath+'.json'
+        self.meta = {'shape': None, 'settings': settings, 'titles': [], 'filenames': [], 'times': []}
+        self.file = open(self.datapath, 'wb')
+
+    def write(self, title, filename, time, data, corrected, xscale):
+        scan = np.ascontiguousarray(np.hstack([data, corrected, xscale]), dtype=np.float64)
+        if self.meta['shape'] is None:
+            self.meta['shape'] = list(scan.shape)
+        self.file.write(scan.tobytes())
+        PROFILER.add(bytes_written=scan.nbytes)
+        self.meta['titles'].append(title)
+        self.meta['filenames'].append(filename)
+        self.meta['times'].append(str(time))
+
+    def close(self):
+        self.file.close()
+        with open(self.metapath+'.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(self.metapath+'.tmp', self.metapath)
+
+
+def load_render_cache(filepath):
+    '''
+    Memory-map the scans saved by RenderCache, returning (data, corrected,
+    xscales, meta) with data and corrected (scans x bins x channels).
+    '''
+    if not os.path.exists(filepath+'.json'):
+        raise FileNotFoundError('No render cache at '+filepath+'.json, run with --preview first')
+    with open(filepath+'.json') as f:
+        meta = json.load(f)
+    shape = (len(meta['filenames']),)+tuple(meta['shape'])
+    scans = np.memmap(filepath+'.f64', dtype=np.float64, mode='r', shape=shape)
+    channels = (shape[2]-1)//2
+    return scans[:, :, :channels], scans[:, :, channels:2*channels], scans[:, :, -1], meta
+
+
+def time_of_day(text):
+    '''
+    Seconds after midnight of 'HH:MM' or 'HH:MM:SS'.
+    '''
+    parts = [int(part) for part in text.split(':')]
+    if len(parts) not in (2, 3):
+        raise ValueError('Expected a time HH:MM or HH:MM:SS, got '+repr(text))
+    return parts[0]*3600 + parts[1]*60 + (parts[2] if len(parts) == 3 else 0)
+
+
+def select_scans(selection, times):
+    '''
+    Indices of the scans taken at times chosen by selection, a
+    comma-separated list of scan numbers (e.g. 5), scan number ranges
+    (e.g. 3-9) and UTC time ranges (e.g. 21:05-21:10, which may run past
+    midnight).
+    '''
+    times = np.asarray(times, dtype='datetime64[s]')
+    seconds = (times - times.astype('datetime64[D]')).astype(np.int64)
+    chosen = np.zeros(len(times), dtype=bool)
+    for item in [item.strip() for item in str(selection).split(',') if item.strip()]:
+        start, sep, end = item.partition('-')
+        end = end if sep else start
+        if ':' in item:
+            start, end = time_of_day(start), time_of_day(end)
+            if start <= end:
+                chosen |= (seconds >= start) & (seconds <= end)
+            else:
+                chosen |= (seconds >= start) | (seconds <= end)
+        else:
+            chosen[max(int(start), 1)-1:int(end)] = True
+    return np.flatnonzero(chosen)
+
+
+class ContactSheet():
+    '''
+    Thumbnails of the corrected spectra of every scan, SHEET_COLUMNS x
+    SHEET_ROWS to a page. Each page is one Axes with one line per channel,
+    the thumbnails being separated by NaN gaps, so a page of a hundred
+    scans draws as quickly as a single plot.
+    '''
+
+    def __init__(self, filepath, dpi=PREVIEW_DPI, fmt='png', columns=SHEET_COLUMNS, rows=SHEET_ROWS):
+        self.filepath = filepath
+        self.dpi = dpi
+        self.fmt = fmt
+        self.columns = columns
+        self.rows = rows
+        self.scans = []  # (scan number, time, corrected) of the page being filled
+        self.saved = []
+
+    def add(self, scan_no, time, corrected):
+        self.scans.append((scan_no, time, np.asarray(corrected)))
+        if len(self.scans) == self.columns*self.rows:
+            self.save_page()
+
+    def save_page(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figure = Figure(figsize=(1.2*self.columns, 0.9*self.rows))
+        FigureCanvasAgg(figure)
+        ax = figure.add_axes([0, 0, 1, 1])
+        channels = self.scans[0][2].shape[1]
+        x = [[] for i in range(channels)]
+        y = [[] for i in range(channels)]
+        for k, (scan_no, time, corrected) in enumerate(self.scans):
+            column, row = k % self.columns, k // self.columns
+            finite = corrected[np.isfinite(corrected)]
+            low, high = (finite.min(), finite.max()) if finite.size else (0, 1)
+            # Each thumbnail is scaled to fill its cell, leaving room for its label
+            scale = 0.7/(high - low) if high > low else 0
+            cellx = column + 0.05 + 0.9*np.arange(len(corrected))/max(len(corrected)-1, 1)
+            for i in range(channels):
+                x[i] += [cellx, [np.nan]]
+                y[i] += [-row - 0.9 + (corrected[:, i] - low)*scale, [np.nan]]
+            ax.text(column + 0.05, -row - 0.05, str(scan_no)+'  '+str(time)[11:16], fontsize=6, va='top')
+        for i in range(channels):
+            ax.plot(np.concatenate(x[i]), np.concatenate(y[i]), linewidth=0.5)
+        ax.set_xlim(0, self.columns)
+        ax.set_ylim(-self.rows, 0)
+        ax.set_xticks(np.arange(self.columns+1))
+        ax.set_yticks(-np.arange(self.rows+1))
+        ax.tick_params(length=0, labelbottom=False, labelleft=False)
+        ax.grid(True, linewidth=0.5)
+        filepath = self.filepath+' '+str(self.scans[0][0])+'-'+str(self.scans[-1][0])+'.'+self.fmt
+        figure.savefig(filepath, dpi=self.dpi, format=self.fmt)
+        PROFILER.add_file(filepath)
+        self.saved.append(filepath)
+        self.scans = []
+
+    def close(self):
+        if self.scans:
+            self.save_page()
+        return self.saved
+
+
+def export_scans(filepath, selection, plotpath, dpi, fmt='png'):
+    '''
+    Render the scans chosen by selection (see select_scans) from the render
+    cache at filepath, saving each in plotpath under its own filename at
+    dpi. Returns the filenames saved.
+    '''
+    from acap.render import SpectrumRenderer
+
+    data, corrected, xscales, meta = load_render_cache(filepath)
+    settings = meta['settings']
+    noisedata = np.array(settings['noise']) if settings['noise'] is not None else None
+    chosen = select_scans(selection, meta['times'])
+    renderer = SpectrumRenderer(np.array(settings['xscale'])[:, np.newaxis], np.array(settings['xticks']),
+                                settings['xlabel'], settings['ylabel'], data.shape[2], noisedata,
+                                settings['offset'], settings['alpha'], dpi, fmt)
+    saved = []
+    for k in chosen:
+        renderer.render(meta['titles'][k], data[k], corrected[k], plotpath+meta['filenames'][k],
+                        xscales[k][:, np.newaxis])
+        saved.append(meta['filenames'][k])
+    return saved
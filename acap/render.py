@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Reusable figure for rendering many spectra to files.
+
+The Figure, Axes, lines and legend are built once on an Agg canvas. Each
+scan then only updates the line data and the title before being saved.
+"""
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from acap.instrument import PROFILER
+
+
+class SpectrumRenderer():
+    FONT = 'arial'
+
+    def __init__(self, xscale, xticks, xlabel, ylabel, num_channels, noisedata=None,
+                 offset=0, alpha=1, dpi=1000, fmt='png', yticks=None):
+        self.offset = offset
+        self.dpi = dpi
+        self.fmt = fmt
+        self.xticks = xticks
+        self.yticks = yticks if yticks is not None else np.arange(-1, 12, 1)
+        self.figure = Figure()
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        ax = self.axes
+
+        self.raw_lines = []
+        self.corrected_lines = []
+        blank = np.zeros(len(xscale))
+        for i in range(num_channels):
+            line, = ax.plot(xscale, blank, label = 'Noise-distorted methanol-line spectrum', alpha = alpha)
+            self.raw_lines.append(line)
+            if noisedata is not None:
+                ax.plot(xscale, noisedata[:,i]+offset, label = 'Noise profile', alpha = alpha)
+                line, = ax.plot(xscale, blank, label = 'Undistorted methanol-line spectrum')
+                self.corrected_lines.append(line)
+        ax.set_xticks(self.xticks)
+        ax.set_yticks(self.yticks)
+        ax.grid(True)
+        ax.tick_params(direction ='in', labelsize=9)
+        ax.set_ylabel(ylabel, family=self.FONT, fontsize=11)
+        ax.set_xlabel(xlabel, family=self.FONT, fontsize=11)
+        self.title = ax.set_title('', family=self.FONT, fontsize=11)
+        ax.legend(fontsize=9)
+
+    def render(self, title, data, corrected=None, filepath=None, xscale=None):
+        '''
+        Draw one scan (bins x channels) and, if filepath is given, save it as
+        filepath plus the output format's extension. xscale replaces the
+        x-axis for this and later scans (e.g. for a per-scan velocity shift).
+        '''
+        if xscale is not None:
+            for line in self.raw_lines + self.corrected_lines:
+                line.set_xdata(xscale)
+        for i, line in enumerate(self.raw_lines):
+            line.set_ydata(data[:,i]+self.offset)
+        for i, line in enumerate(self.corrected_lines):
+            line.set_ydata(corrected[:,i])
+        self.title.set_text(title)
+        ax = self.axes
+        ax.relim()
+        ax.autoscale_view()
+        # Fixed ticks widen the view limits just as they do for a new figure
+        ax.set_xticks(self.xticks)
+        ax.set_yticks(self.yticks)
+        if filepath is not None:
+            self.figure.savefig(filepath+'.'+self.fmt, dpi=self.dpi, format=self.fmt)
+            PROFILER.add_file(filepath+'.'+self.fmt)
+        else:
+            self.figure.canvas.draw()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Solar calibration products computed over all scans of a ScanCube at once.
+"""
+
+import numpy as np
+
+from acap.flags import masked
+
+
+class SolarCalibration():
+    '''
+    Windowed statistics of every scan in a Solar calibration (drift) run.
+
+    means, medians and stds hold one value per scan over the data points
+    lower:upper and all channels; channel_means is the (scans x channels)
+    time series of each channel. When mean_noise is given, excess is the
+    intensity above the noise and y_factor the on/off ratio of each scan.
+    Data points flagged in mask (scans x bins x channels, see
+    acap/flags.py) are left out of every statistic.
+    '''
+
+    def __init__(self, cube, lower, upper, mean_noise=None, mask=None):
+        window = cube.window(lower, upper)
+        self.times = cube.times
+        self.lower = lower
+        self.upper = upper
+        if mask is not None and mask[:, lower:upper, :].any():
+            window = masked(window, mask[:, lower:upper, :])
+            flat = window.reshape(len(window), -1)
+            self.means = np.nanmean(flat, axis=1, dtype=np.float64)
+            self.medians = np.nanmedian(flat, axis=1)
+            self.stds = np.nanstd(flat, axis=1, dtype=np.float64)
+            self.channel_means = np.nanmean(window, axis=1, dtype=np.float64)
+        else:
+            flat = window.reshape(len(window), -1)
+            self.means = np.mean(flat, axis=1, dtype=np.float64)
+            self.medians = np.median(flat, axis=1)
+            self.stds = np.std(flat, axis=1, dtype=np.float64)
+            self.channel_means = np.mean(window, axis=1, dtype=np.float64)
+        self.bin_series = window  # (scans x bins x channels) view of the window
+        self.mean_noise = mean_noise
+        self.excess = None
+        self.y_factor = None
+        if mean_noise is not None:
+            self.excess = self.means - mean_noise
+            self.y_factor = self.means / mean_noise
+
+    @classmethod
+    def from_chunks(cls, chunks, lower, upper, mean_noise=None, seriespath=None, num_scans=None):
+        '''
+        SolarCalibration of a night read in (cube, mask) pieces, so only one
+        piece is held in memory at a time. The per-bin time series of the
+        num_scans scans is written to a memory-mapped .npy file at
+        seriespath, or not kept when seriespath is None.
+        '''
+        parts = []
+        series = None
+        done = 0
+        for cube, mask in chunks:
+            part = cls(cube, lower, upper, mask=mask)
+            if seriespath is not None and len(part) > 0:
+                if series is None:
+                    series = np.lib.format.open_memmap(seriespath, mode='w+', dtype=np.float64,
+                                                       shape=(num_scans,)+part.bin_series.shape[1:])
+                series[done:done+len(part)] = part.bin_series
+            done += len(part)
+            part.bin_series = None
+            parts.append(part)
+        solarcal = parts[0]
+        solarcal.times = np.concatenate([part.times for part in parts])
+        solarcal.means = np.concatenate([part.means for part in parts])
+        solarcal.medians = np.concatenate([part.medians for part in parts])
+        solarcal.stds = np.concatenate([part.stds for part in parts])
+        solarcal.channel_means = np.concatenate([part.channel_means for part in parts])
+        solarcal.bin_series = series
+        solarcal.mean_noise = mean_noise
+        if mean_noise is not None:
+            solarcal.excess = solarcal.means - mean_noise
+            solarcal.y_factor = solarcal.means / mean_noise
+        return solarcal
+
+    def __len__(self):
+        return len(self.means)
+
+    def gain(self):
+        '''
+        Peak intensity above the noise over the run, in Volts, or None
+        without a noise measurement.
+        '''
+        if self.excess is None:
+            return None
+        return float(np.max(self.excess))
+
+    def jy_per_volt(self, solar_flux):
+        '''
+        Conversion from Volts to Jy (yscale2const) given the Solar flux
+        density in Jy at the observed frequency.
+        '''
+        gain = self.gain()
+        if gain is None or gain <= 0:
+            return None
+        return solar_flux / gain
+
+    def summary(self):
+        return {'scans': len(self),
+                'mean': float(np.mean(self.means)),
+                'median': float(np.median(self.means)),
+                'std': float(np.std(self.means)),
+                'mean_noise': self.mean_noise,
+                'gain': self.gain()}
+
+    def save_table(self, filepath):
+        '''
+        Write one row per scan (time, mean, median, std, excess, y-factor and
+        each channel's mean) as comma-separated values.
+        '''
+        columns = ['scan', 'time', 'mean', 'median', 'std', 'excess', 'y_factor']
+        columns += ['mean_ch'+str(i+1) for i in range(self.channel_means.shape[1])]
+        with open(filepath, 'w') as f:
+            f.write('# '+', '.join(k+'='+str(v) for k, v in self.summary().items())+'\n')
+            f.write(','.join(columns)+'\n')
+            for k in range(len(self)):
+                row = [str(k+1), str(self.times[k]), '%.6f' % self.means[k],
+                       '%.6f' % self.medians[k], '%.6f' % self.stds[k]]
+                if self.excess is not None:
+                    row += ['%.6f' % self.excess[k], '%.6f' % self.y_factor[k]]
+                else:
+                    row += ['', '']
+                row += ['%.6f' % v for v in self.channel_means[k]]
+                f.write(','.join(row)+'\n')
+
+    def save_timeseries(self, filepath):
+        '''
+        Save the per-channel and per-bin time series of the window (.npz).
+        '''
+        np.savez(filepath, times=self.times.astype(np.int64), lower=self.lower,
+                 upper=self.upper, channel_means=self.channel_means,
+                 bin_series=np.ascontiguousarray(self.bin_series))
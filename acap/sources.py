@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Scan files stored either in folders or inside .zip/.tar archives.
+
+A path that runs through an archive names the folder or file inside it,
+e.g. 'ClassicData/17-03-2021.tar.gz/W51/Raw Data/W51 ... UTC.7'. Members
+are read straight from the archive into memory, nothing is extracted to
+disk. Zip members are read one at a time; a compressed tarball can only
+be read from the start, so the first read from a folder inside it reads
+every file of that folder in one pass, and holds them until they are read
+or another folder is.
+"""
+
+import io
+import os
+import errno
+import zipfile
+import tarfile
+import datetime
+import collections
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+# Size and mtime of a file or archive member, like os.stat_result
+FileStat = collections.namedtuple('FileStat', ['st_size', 'st_mtime_ns'])
+
+# Open archives, keyed by path and reopened when the archive file changes
+_archives = {}
+
+
+def archive_suffix(name):
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return suffix
+    return None
+
+
+def split_archive_path(path):
+    '''
+    (archive, member path) for a path inside an archive, or (None, path).
+    '''
+    parts = path.replace(os.sep, '/').split('/')
+    for k in range(1, len(parts)+1):
+        if archive_suffix(parts[k-1]) is not None:
+            archivepath = '/'.join(parts[:k]) or '/'
+            if os.path.isfile(archivepath):
+                return archivepath, '/'.join(p for p in parts[k:] if p)
+    return None, path
+
+
+def outside_archive(path):
+    '''
+    The path with its archive name replaced by a folder of the same name
+    without the suffix, e.g. for writing the outputs of an archived night
+    next to the archive.
+    '''
+    archivepath, member = split_archive_path(path)
+    if archivepath is None:
+        return path
+    folder = archivepath[:-len(archive_suffix(archivepath))]
+    # An archive of the folder itself, e.g. 17-03-2021.tar.gz holding 17-03-2021/
+    stem = os.path.basename(folder)
+    if member == stem or member.startswith(stem+'/'):
+        member = member[len(stem)+1:]
+    return os.path.join(folder, member, '') if path.endswith('/') else os.path.join(folder, member)
+
+
+def archive_folder(path):
+    '''
+    The path, or for an archive of a folder of the same name (e.g.
+    17-03-2021.tar.gz made from 17-03-2021/), the path of that folder.
+    '''
+    archivepath, member = split_archive_path(path)
+    if archivepath is None or member.strip('/'):
+        return path
+    stem = os.path.basename(archivepath)[:-len(archive_suffix(archivepath))]
+    if stem in listdir(path, folders=True):
+        return os.path.join(path, stem)
+    return path
+
+
+class ZipArchive():
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path)
+        self.members = {info.filename.rstrip('/'): info for info in self.zip.infolist()}
+
+    def is_dir(self, member):
+        return member in self.members and self.members[member].is_dir()
+
+    def names(self):
+        return [(name, info.is_dir()) for name, info in self.members.items()]
+
+    def stat(self, member):
+        info = self.members[member]
+        # Zip times are local and have a 2 second resolution, which is enough to spot a changed member
+        return FileStat(info.file_size, int(datetime.datetime(*info.date_time).timestamp()*1e9))
+
+    def open(self, member):
+        return self.zip.open(self.members[member])
+
+
+def member_name(info):
+    name = info.name[2:] if info.name.startswith('./') else info.name
+    return name.rstrip('/')
+
+
+class TarArchive():
+    def __init__(self, path):
+        self.path = path
+        with tarfile.open(path, 'r:*') as tar:
+            self.members = {member_name(info): info for info in tar.getmembers()}
+        self.loaded = {}  # Files of the folder read last that have not been opened yet
+
+    def is_dir(self, member):
+        return member in self.members and self.members[member].isdir()
+
+    def names(self):
+        return [(name, info.isdir()) for name, info in self.members.items()]
+
+    def stat(self, member):
+        info = self.members[member]
+        return FileStat(info.size, int(info.mtime*1e9))
+
+    def open(self, member):
+        folder = os.path.dirname(member)
+        if member not in self.loaded:
+            # One sequential pass reads every file of the folder; files left from the
+            # folder read before (e.g. found in the scan cache) are dropped
+            self.loaded = {}
+            with tarfile.open(self.path, 'r|*') as tar:
+                for info in tar:
+                    name = member_name(info)
+                    if info.isfile() and os.path.dirname(name) == folder:
+                        self.loaded[name] = tar.extractfile(info).read()
+        return io.BytesIO(self.loaded.pop(member))
+
+
+def open_archive(path):
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    if path not in _archives or _archives[path][0] != key:
+        if archive_suffix(path) == '.zip':
+            _archives[path] = (key, ZipArchive(path))
+        else:
+            _archives[path] = (key, TarArchive(path))
+    return _archives[path][1]
+
+
+def close_archives():
+    '''
+    Forget every open archive and the files read from them.
+    '''
+    _archives.clear()
+
+
+def listdir(directory, folders=False):
+    '''
+    Names of the files (or with folders, the subfolders) in a folder,
+    skipping those starting with a '.'. Raises FileNotFoundError when the
+    folder does not exist, inside an archive too.
+    '''
+    archivepath, member = split_archive_path(directory)
+    if archivepath is None:
+        with os.scandir(directory) as it:
+            return [item.name for item in it if not item.name.startswith('.')
+                    and (item.is_dir() if folders else item.is_file())]
+    if not isdir(directory):
+        raise FileNotFoundError(errno.ENOENT, 'No such folder in '+archivepath, directory)
+    archive = open_archive(archivepath)
+    prefix = member.strip('/')
+    names = []
+    for name, is_dir in archive.names():
+        parent, base = os.path.split(name)
+        if parent == prefix and not base.startswith('.') and is_dir == folders:
+            names.append(base)
+    if folders:
+        # Tarballs do not always hold entries for their folders
+        for name, is_dir in archive.names():
+            parts = name.split('/')
+            depth = len(prefix.split('/')) if prefix else 0
+            if len(parts) > depth+1 and '/'.join(parts[:depth]) == prefix and not parts[depth].startswith('.'):
+                if parts[depth] not in names:
+                    names.append(parts[depth])
+    return names
+
+
+def isdir(path):
+    archivepath, member = split_archive_path(path)
+    if archivepath is None:
+        return os.path.isdir(path)
+    member = member.strip('/')
+    if member == '':
+        return True
+    archive = open_archive(archivepath)
+    return archive.is_dir(member) or any(name.startswith(member+'/') for name, is_dir in archive.names())
+
+
+def stat(filepath):
+    archivepath, member = split_archive_path(filepath)
+    if archivepath is None:
+        return os.stat(filepath)
+    return open_archive(archivepath).stat(member)
+
+
+def open_file(filepath):
+    '''
+    Binary file object of a file or archive member.
+    '''
+    archivepath, member = split_archive_path(filepath)
+    if archivepath is None:
+        return open(filepath, 'rb')
+    return open_archive(archivepath).open(member)
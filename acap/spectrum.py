@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Reading of individual SpectraCyber scan files.
+"""
+
+import datetime
+
+import numpy as np
+
+from acap.instrument import PROFILER
+from acap.sources import open_file
+
+
+def parse_spectrum(buffer, header_length=1, delimiter='  '):
+    '''
+    Split the raw bytes of a scan file into its header and numeric block.
+
+    The first header_length lines form the header and the last line (EOF
+    marker) is dropped. The remaining rows are converted to floats in one
+    call, so ragged trailing delimiters are ignored.
+    '''
+    if b'\n' not in buffer:
+        # Files saved with classic Mac line endings only contain '\r'
+        buffer = buffer.replace(b'\r', b'\n')
+    lines = buffer.split(b'\n', header_length)
+    header = np.array([line.decode('ascii').strip('\r').strip(delimiter)
+                       for line in lines[:header_length]])
+    body = lines[header_length] if len(lines) > header_length else b''
+
+    # Drop EOF: cut at the start of the final line
+    end = len(body)
+    if body.endswith(b'\n'):
+        end -= 1
+    body = body[:max(body.rfind(b'\n', 0, end), 0)]
+
+    first_row = body[:body.find(b'\n')] if b'\n' in body else body
+    num_columns = len(first_row.split())
+    values = np.array(body.split(), dtype=np.float64)
+    if num_columns == 0 or values.size % num_columns != 0:
+        raise ValueError('Inconsistent number of channels in scan data')
+    data = values.reshape(-1, num_columns)
+    if len(data) != body.count(b'\n') + 1:
+        raise ValueError('Inconsistent number of channels in scan data')
+    return header, data
+
+
+class Spectrum():
+    DELIMITER = '  '
+    HEADER_LENGTH = 1  # First line of each .txt file
+    POS_INDEX = 1  # Where the position data is in the header
+
+    def __init__(self, filepath, cache=None):
+        self.filepath = filepath
+
+        # A ScanCache hit skips reading and parsing the text file entirely
+        cached = cache.get(filepath) if cache is not None else None
+        if cached is None:
+            self.header, self.data = parse_spectrum(self.extract_data(),
+                                                    self.HEADER_LENGTH,
+                                                    self.DELIMITER)
+            if cache is not None:
+                cache.put(filepath, self.header, self.data)
+        else:
+            self.header, self.data = cached
+        PROFILER.add(files=1)
+
+        self.num_channels = len(self.data[0])
+
+    def extract_data(self):
+        # The whole file (or archive member) is read once as bytes and parsed in memory
+        with open_file(self.filepath) as f:
+            buffer = f.read()
+        PROFILER.add(bytes_read=len(buffer))
+        return buffer
+
+
+def scan_labels(header, target, scan_no, timezone, separator=' - '):
+    '''
+    Build the plot title and output filename of a scan from its header.
+
+    The title shows the local (GMT/BST) time while the filename keeps the
+    hour recorded by the SpectraCyber.
+    '''
+    scaninfo = str(header).split(' ')
+    month_modifier = ''
+    day_modifier = ''
+    hour_modifier = ''
+    minute_modifier = ''
+    second_modifier = ''
+    if int(scaninfo[1]) < 10:
+        month_modifier = '0'
+    if int(scaninfo[2]) < 10:
+        day_modifier = '0'
+    hour = int(scaninfo[4])
+    if timezone == 'BST':
+        hour += 1
+    if hour < 10:
+        hour_modifier = '0'
+    if int(scaninfo[5]) < 10:
+        minute_modifier = '0'
+    if int(scaninfo[6]) < 10:
+        second_modifier = '0'
+    title = target+separator+'Scan number '+str(scan_no) + ' - '+day_modifier+str(scaninfo[2])+'/'+month_modifier+str(scaninfo[1])+'/'+str(scaninfo[3])+' '+hour_modifier+str(hour)+':'+minute_modifier+str(scaninfo[5])+':'+second_modifier+str(scaninfo[6])
+    filename = day_modifier+str(scaninfo[2])+'-'+month_modifier+str(scaninfo[1])+'-'+str(scaninfo[3])+' '+hour_modifier+str(scaninfo[4])+':'+minute_modifier+str(scaninfo[5])+':'+second_modifier+str(scaninfo[6])
+    return title, filename
+
+
+def scan_time(header):
+    '''
+    Time recorded by the SpectraCyber (UTC) in the header of a scan.
+    '''
+    scaninfo = str(header).split(' ')
+    return np.datetime64(datetime.datetime(int(scaninfo[3]), int(scaninfo[1]), int(scaninfo[2]),
+                                           int(scaninfo[4]), int(scaninfo[5]), int(scaninfo[6])), 's')
+
+
+def scan_sort_key(filename):
+    '''
+    Sort key putting 'Name YYYY-MM-DD HH MM SS UTC.NNN' files in scan order
+    whether or not the scan number has been zero-padded.
+    '''
+    name, sep, number = filename.rpartition('UTC.')
+    if sep and number.isdigit():
+        return (name, int(number), filename)
+    return (filename, -1, filename)
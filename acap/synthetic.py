@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic SpectraCyber nights for benchmarking and trying out the program
+without telescope data.
+
+A night is written as DATE/TARGET/Raw Data and DATE/TARGET/Noise folders in
+the same format as the real scan files: one header line in the form read
+by scaninfo, double-space-delimited rows with a trailing delimiter, CRLF
+line endings, an EOF line and unpadded 'UTC.' scan number suffixes.
+"""
+
+import os
+import datetime
+
+import numpy as np
+
+DELIMITER = '  '
+START = datetime.datetime(2021, 3, 17, 21, 0, 0)  # Time of the first scan
+SCAN_INTERVAL = 60  # Seconds between scans
+
+
+def scan_header(time, azimuth=248.75, altitude=31.83):
+    '''
+    Header line of a scan taken at time (UTC): month, day, year, hour,
+    minute and second are items 1 to 6 of header.split(' ').
+    '''
+    return ('DATE ' + str(time.month) + ' ' + str(time.day) + ' ' + str(time.year) + ' '
+            + str(time.hour) + ' ' + str(time.minute) + ' ' + str(time.second)
+            + ' UTC  AZ ' + str(azimuth) + ' EL ' + str(altitude))
+
+
+def scan_filename(target, time, scan_no):
+    # Scan numbers are not zero padded, e.g. 'UTC.7' and 'UTC.12'
+    return target + ' ' + time.strftime('%Y-%m-%d %H %M %S') + ' UTC.' + str(scan_no)
+
+
+def scan_text(header, data):
+    '''
+    Full text of a scan file for data (bins x channels).
+    '''
+    row = DELIMITER.join(['%.6f']*data.shape[1]) + DELIMITER + '\r\n'
+    return header + '\r\n' + (row*len(data)) % tuple(data.ravel()) + 'EOF\r\n'
+
+
+def synthetic_scan(rng, bins=399, channels=1, line=True, level=2.0, noise=0.1):
+    '''
+    Random spectrum (bins x channels) around level, with a Gaussian
+    methanol-like line in the middle of the band if line is set.
+    '''
+    data = level + noise*rng.standard_normal((bins, channels))
+    if line:
+        x = np.arange(bins)[:, None]
+        data += 1.5*np.exp(-((x - bins//2)/5.0)**2)
+    return data
+
+
+def write_night(directory, num_scans, num_noise=None, bins=399, channels=1, target='W51',
+                start=START, interval=SCAN_INTERVAL, seed=0):
+    '''
+    Write num_scans raw scans and num_noise noise scans (default num_scans)
+    of target into directory/Raw Data and directory/Noise, replacing any
+    files already there. Returns the (raw, noise) file paths.
+    '''
+    if not 1 <= num_scans <= 999:
+        raise ValueError('num_scans must be between 1 and 999')
+    if num_noise is None:
+        num_noise = num_scans
+    rng = np.random.default_rng(seed)
+    filepaths = []
+    for folder, count, line in (('Raw Data', num_scans, True), ('Noise', num_noise, False)):
+        folderpath = os.path.join(directory, folder)
+        os.makedirs(folderpath, exist_ok=True)
+        for x in os.listdir(folderpath):
+            os.remove(os.path.join(folderpath, x))
+        paths = []
+        for k in range(1, count+1):
+            time = start + datetime.timedelta(seconds=k*interval)
+            filepath = os.path.join(folderpath, scan_filename(target, time, k))
+            data = synthetic_scan(rng, bins, channels, line)
+            with open(filepath, 'w', newline='') as f:
+                f.write(scan_text(scan_header(time), data))
+            paths.append(filepath)
+        filepaths.append(paths)
+    return filepaths[0], filepaths[1]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Frequency and LSR velocity axes, and the Doppler corrections to the LSR.
+
+The corrections are the same as in the original console program (Earth
+rotation towards the pointing, Earth's orbital motion and the Solar
+peculiar motion) but work on arrays, so the shift of every scan is found
+in one call from the times in the scan headers.
+"""
+
+import functools
+
+import numpy as np
+
+LATITUDE = 53.9436  # Astrocampus latitude in degrees
+REST_FREQUENCIES = {'h': 1420406000, 'm': 6668518000}  # HI and methanol receivers (Hz)
+SPEED_OF_LIGHT = 300000000/1000  # km/s
+
+
+@functools.lru_cache(maxsize=None)
+def frequency_axis(f_lower, f_upper, f_step):
+    '''
+    Doppler-shifted frequency (kHz) of each data point, as a read-only
+    column. Axes are memoized per (f_lower, f_upper, f_step).
+    '''
+    xscale = np.expand_dims(np.arange(f_lower, f_upper-f_step, f_step), axis = 1)
+    xscale.setflags(write=False)
+    return xscale
+
+
+@functools.lru_cache(maxsize=None)
+def velocity_axis(f_lower, f_upper, f_step, receiver):
+    '''
+    Velocity (km/s) of each data point for the receiver ('h' or 'm'),
+    before any LSR correction. Memoized like frequency_axis.
+    '''
+    rest = REST_FREQUENCIES[receiver.lower()]
+    xscale = SPEED_OF_LIGHT*(1-(((frequency_axis(f_lower, f_upper, f_step)*1000) + rest)/(rest)))
+    xscale.setflags(write=False)
+    return xscale
+
+
+def days_since_solstice(times):
+    '''
+    Days (with fraction) since the latest 21st December for each time.
+    '''
+    times = np.asarray(times, dtype='datetime64[s]')
+    years = times.astype('datetime64[Y]')
+    solstice = (years+1).astype('datetime64[D]') - np.timedelta64(11, 'D')
+    solstice = np.where(times < solstice, years.astype('datetime64[D]') - np.timedelta64(11, 'D'), solstice)
+    return (times - solstice) / np.timedelta64(1, 'D')
+
+
+def earth_rotation_velocity(azimuth, altitude, latitude=LATITUDE):
+    maximum = 0.46388889 * np.cos(np.radians(latitude))
+    return maximum * np.cos(np.radians(azimuth-90)) * np.cos(np.radians(altitude))
+
+
+def earth_orbital_velocity(days_passed, galactic_longitude):
+    return 29.78 * np.sin(np.radians(90 + galactic_longitude + (90-((360/365)*days_passed))))
+
+
+def solar_peculiar_motion(galactic_longitude, galactic_latitude):
+    l = np.radians(galactic_longitude)
+    b = np.radians(galactic_latitude)
+    return 9*np.cos(l)*np.cos(b) + 12*np.sin(l)*np.cos(b) + 7*np.sin(b)
+
+
+def velocity_shifts(times, azimuth, altitude, galactic_longitude, galactic_latitude, latitude=LATITUDE):
+    '''
+    LSR velocity shift (km/s) of each scan, from the scan times (UTC) and the
+    fixed pointing of the dish. Any of the arguments may be arrays.
+    '''
+    return (earth_rotation_velocity(azimuth, altitude, latitude)
+            + earth_orbital_velocity(days_since_solstice(times), galactic_longitude)
+            + solar_peculiar_motion(galactic_longitude, galactic_latitude))
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental processing of scans as the SpectraCyber writes them.
+
+The Raw Data folder is polled (and, when the optional watchdog package is
+installed, woken up by filesystem events) for files that have not been
+processed yet. Each new scan is corrected, plotted, saved and added to the
+Solar calibration table on its own, and a small state file records the
+finished scans so that a restarted watch carries on where it stopped.
+"""
+
+import os
+import json
+import time
+import threading
+
+import numpy as np
+
+from acap.spectrum import Spectrum, scan_labels, scan_sort_key, scan_time
+from acap.velocity import velocity_shifts
+from acap.flags import masked
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
+
+def canonical_name(filename):
+    '''
+    Filename with the scan number zero-padded to three digits, as earlier
+    versions of acap_3.py renamed it, so a scan is recognised as done
+    whether or not its file was renamed.
+    '''
+    name, number, _ = scan_sort_key(filename)
+    if number < 0:
+        return filename
+    return name+'UTC.'+str(number).zfill(3)
+
+
+class ScanWatcher():
+    def __init__(self, directory, statepath, interval=10.0):
+        self.directory = directory
+        self.statepath = statepath
+        self.interval = interval
+        self.done = []
+        self.sizes = {}  # Sizes seen on the previous poll, to skip files still being written
+        if os.path.exists(statepath):
+            with open(statepath) as f:
+                self.done = json.load(f)['done']
+        self.done_set = set(self.done)
+        self.event = threading.Event()
+
+    @property
+    def scans_done(self):
+        return len(self.done)
+
+    def new_files(self):
+        '''
+        Unprocessed files, in scan order, whose size has stopped changing.
+        '''
+        ready = []
+        for filename in sorted(os.listdir(self.directory), key=scan_sort_key):
+            if filename.startswith('.') or canonical_name(filename) in self.done_set:
+                continue
+            stat = os.stat(os.path.join(self.directory, filename))
+            settled = time.time() - stat.st_mtime > self.interval
+            if stat.st_size > 0 and (settled or self.sizes.get(filename) == stat.st_size):
+                ready.append(filename)
+            self.sizes[filename] = stat.st_size
+        return ready
+
+    def mark_done(self, filename):
+        self.done.append(canonical_name(filename))
+        self.done_set.add(canonical_name(filename))
+        self.sizes.pop(filename, None)
+        with open(self.statepath+'.tmp', 'w') as f:
+            json.dump({'done': self.done}, f)
+        os.replace(self.statepath+'.tmp', self.statepath)
+
+    def wait(self):
+        self.event.wait(self.interval)
+        self.event.clear()
+
+    def run(self, handle):
+        '''
+        Call handle(filepath, scan_no) for every new scan until interrupted
+        (Ctrl+C). Scan numbers continue from the scans already done.
+        '''
+        observer = None
+        if Observer is not None:
+            watcher = self
+
+            class Wake(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    watcher.event.set()
+
+            observer = Observer()
+            observer.schedule(Wake(), self.directory)
+            observer.start()
+        print('Watching '+self.directory+' ('+str(self.scans_done)+' scans already processed, Ctrl+C to stop)')
+        try:
+            while True:
+                for filename in self.new_files():
+                    handle(os.path.join(self.directory, filename), self.scans_done+1)
+                    self.mark_done(filename)
+                self.wait()
+        except KeyboardInterrupt:
+            print('\nStopped watching after '+str(self.scans_done)+' scans')
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+
+class IncrementalProcessor():
+    '''
+    Processes one scan at a time as the serial single-spectrum and Solar
+    calibration modes would, appending Solar calibration points to a table.
+
+    settings holds target, timezone, offset, alpha, xticks, xlabel, ylabel,
+    dpi, format, savegraphs, plotpath, singlegraphs, solarcal, lower,
+    upper and solarpath, plus mean_noise when a noise profile is given.
+    When xscale is an LSR velocity axis, settings also holds velocity
+    (azimuth, altitude, galactic longitude, galactic latitude) and
+    velocity_shift, the shift already applied to xscale, so each scan can
+    be moved by its own shift. Processed spectra are passed to writers.
+    '''
+
+    def __init__(self, settings, xscale, noisedata=None, cache=None, writers=()):
+        self.settings = settings
+        self.writers = writers
+        self.xscale = xscale
+        self.noisedata = noisedata
+        self.cache = cache
+        self.renderer = None  # Built for the first scan, once its channel count is known
+
+    def __call__(self, filepath, scan_no):
+        settings = self.settings
+        offset = settings['offset']
+        scan = Spectrum(filepath, cache=self.cache)
+        title, filename = scan_labels(scan.header, settings['target'], scan_no, settings['timezone'])
+        print(str(scan_no)+' - '+os.path.basename(filepath))
+        mask = None
+        if settings.get('flagger') is not None:
+            mask = settings['flagger'].flag(scan.data)
+        if settings['singlegraphs']:
+            xscale = self.xscale
+            if settings.get('velocity') is not None:
+                shift = velocity_shifts(scan_time(scan.header), *settings['velocity'])
+                xscale = xscale + (float(shift) - settings['velocity_shift'])
+            if self.noisedata is not None:
+                corrected = scan.data/self.noisedata+offset-1
+            else:
+                corrected = scan.data
+            corrected = masked(corrected, mask)
+            if settings['savegraphs']:
+                if self.renderer is None:
+                    from acap.render import SpectrumRenderer
+                    self.renderer = SpectrumRenderer(self.xscale, settings['xticks'], settings['xlabel'],
+                                                     settings['ylabel'], scan.num_channels, self.noisedata,
+                                                     offset, settings['alpha'], settings['dpi'], settings['format'])
+                self.renderer.render(title, scan.data, corrected, settings['plotpath']+filename, xscale)
+            for writer in self.writers:
+                writer.write(filename, scan.header, corrected, xscale)
+            if self.writers:
+                print('File saved - '+filename)
+        if settings['solarcal']:
+            window = scan.data[settings['lower']:settings['upper'],:]
+            if mask is not None and mask[settings['lower']:settings['upper'],:].any():
+                mean = np.nanmean(masked(window, mask[settings['lower']:settings['upper'],:]), dtype=np.float64)
+            else:
+                mean = np.mean(window, dtype=np.float64)
+            self.append_solar_point(scan_no, scan_time(scan.header), mean)
+            print('\t'+str(mean))
+
+    def append_solar_point(self, scan_no, scantime, mean):
+        solarpath = self.settings['solarpath']
+        mean_noise = self.settings.get('mean_noise')
+        new = not os.path.exists(solarpath)
+        with open(solarpath, 'a') as f:
+            if new:
+                f.write('scan,time,mean,excess\n')
+            excess = '' if mean_noise is None else '%.6f' % (mean-mean_noise)
+            f.write(str(scan_no)+','+str(scantime)+','+'%.6f' % mean+','+excess+'\n')
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Waterfall (dynamic spectrum) of a night: every noise-corrected scan as one
+row of a time x frequency/velocity image, rendered as a single figure with
+the mean spectrum of the night underneath.
+
+Scans are added a chunk at a time and step scans are averaged into each
+row, so only the rows of the image and the running mean are held.
+"""
+
+import numpy as np
+
+
+def regrid(data, axes, xscale):
+    '''
+    data (scans x bins x channels), each scan sampled on its own evenly
+    spaced axis (scans x bins), linearly interpolated onto xscale (bins).
+    Data points outside a scan's axis are NaN.
+    '''
+    bins = data.shape[1]
+    position = (xscale[np.newaxis] - axes[:, :1])/(axes[:, 1:2] - axes[:, :1])
+    below = np.clip(np.floor(position).astype(int), 0, bins-2)
+    fraction = (position - below)[..., np.newaxis]
+    rows = np.arange(len(data))[:, np.newaxis]
+    regridded = data[rows, below]*(1-fraction) + data[rows, below+1]*fraction
+    regridded[(position < 0) | (position > bins-1)] = np.nan
+    return regridded
+
+
+class Waterfall():
+    '''
+    Rows (step scans averaged into each) and mean spectrum of the
+    noise-corrected scans of a night on the axis xscale.
+    '''
+
+    def __init__(self, xscale, step=1):
+        self.xscale = np.asarray(xscale, dtype=np.float64).reshape(-1)
+        self.step = max(1, int(step))
+        self.rows = []
+        self.times = []
+        self.pending = []  # Scans and times of the row being filled
+        self.pending_times = []
+        self.total = None  # Running sum and count of the mean spectrum
+        self.count = None
+
+    def add(self, corrected, times, axes=None):
+        '''
+        Add noise-corrected scans (scans x bins x channels) taken at times.
+        axes gives each scan's own x-axis when it is shifted from xscale.
+        '''
+        if len(corrected) == 0:
+            return
+        if axes is not None:
+            corrected = regrid(corrected, axes, self.xscale)
+        finite = np.isfinite(corrected)
+        if self.total is None:
+            self.total = np.zeros(corrected.shape[1:])
+            self.count = np.zeros(corrected.shape[1:], dtype=np.int64)
+        self.total += np.sum(np.where(finite, corrected, 0), axis=0)
+        self.count += np.count_nonzero(finite, axis=0)
+        self.pending.append(corrected)
+        self.pending_times.extend(times)
+        scans = np.concatenate(self.pending)
+        full = len(scans) // self.step * self.step
+        if full > 0:
+            self.add_rows(scans[:full], self.pending_times[:full])
+        self.pending = [scans[full:]] if full < len(scans) else []
+        self.pending_times = self.pending_times[full:]
+
+    def add_rows(self, scans, times):
+        with np.errstate(invalid='ignore'):
+            # A bin flagged in every scan of a row stays NaN
+            blocks = scans.reshape((-1, self.step)+scans.shape[1:])
+            finite = np.isfinite(blocks)
+            rows = np.sum(np.where(finite, blocks, 0), axis=1)/np.count_nonzero(finite, axis=1)
+        self.rows.append(rows)
+        # Each row is placed at the time of its first scan
+        self.times.extend(times[::self.step])
+
+    def finish(self):
+        '''
+        Average the scans left over into a last, shorter row.
+        '''
+        if self.pending:
+            scans = np.concatenate(self.pending)
+            step = self.step
+            self.step = len(scans)
+            self.add_rows(scans, self.pending_times)
+            self.step = step
+            self.pending = []
+            self.pending_times = []
+
+    @property
+    def image(self):
+        return np.concatenate(self.rows) if self.rows else np.empty((0, len(self.xscale), 0))
+
+    @property
+    def mean(self):
+        with np.errstate(invalid='ignore'):
+            return self.total/self.count
+
+    def save(self, filepath, title, xlabel, ylabel='Intensity (Volts)', xticks=None, dpi=300, fmt='png'):
+        '''
+        Render the waterfall of each channel above the night's mean
+        spectrum as one figure.
+        '''
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.dates import DateFormatter
+
+        self.finish()
+        image = self.image
+        times = np.array(self.times, dtype='datetime64[s]')
+        channels = image.shape[2]
+        figure = Figure(figsize=(2+4*channels, 8))
+        FigureCanvasAgg(figure)
+        axes = figure.subplots(2, channels, sharex='col', sharey='row', squeeze=False,
+                               gridspec_kw={'height_ratios': (3, 1)})
+        finite = image[np.isfinite(image)]
+        # The colour scale leaves out the most extreme data points
+        vmin, vmax = np.percentile(finite, (1, 99.5)) if finite.size else (0, 1)
+        for i in range(channels):
+            top, bottom = axes[0, i], axes[1, i]
+            mesh = top.pcolormesh(self.xscale, times, image[:, :, i], shading='nearest',
+                                  vmin=vmin, vmax=vmax, cmap='viridis')
+            top.set_title(title if channels == 1 else title+' - channel '+str(i+1))
+            bottom.plot(self.xscale, self.mean[:, i])
+            bottom.set_xlabel(xlabel)
+            bottom.grid(True)
+            bottom.tick_params(direction='in')
+            if xticks is not None:
+                bottom.set_xticks(xticks)
+        axes[0, 0].set_ylabel('Time (UTC)')
+        axes[0, 0].yaxis.set_major_formatter(DateFormatter('%H:%M'))
+        axes[0, 0].invert_yaxis()
+        axes[1, 0].set_ylabel('Mean '+ylabel[0].lower()+ylabel[1:])
+        # Every channel shares the colour scale; the bar is drawn beside the last waterfall so
+        # both panels keep the same width
+        figure.colorbar(mesh, cax=axes[0, -1].inset_axes([1.03, 0, 0.04, 1]), label=ylabel)
+        figure.savefig(filepath+'.'+fmt, dpi=dpi, format=fmt, bbox_inches='tight')
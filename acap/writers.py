@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Writers for processed spectra.
+
+'txt' keeps one text file per scan (data columns followed by the x-axis),
+'npz' bundles every scan of the night into one compressed NumPy file and
+'bin' appends each scan to one raw float64 file that can be memory-mapped,
+with the header metadata in a JSON-lines file next to it. Both keep each
+scan's own x-axis, as scans may be moved by their own velocity shift.
+"""
+
+import os
+import json
+
+import numpy as np
+
+from acap.instrument import PROFILER
+
+TEXT_FORMAT = '%.6f'  # Fixed float format of the text output
+BUNDLE_NAME = 'Processed spectra'  # Name of the per-night binary bundles
+
+
+def write_text(filepath, data, fmt=TEXT_FORMAT):
+    '''
+    Write a 2D array as space-separated text with one formatting operation
+    for the whole array (much faster than np.savetxt).
+    '''
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, None]
+    row = ' '.join([fmt]*data.shape[1])+'\n'
+    text = (row*len(data)) % tuple(data.ravel())
+    with open(filepath, 'w') as f:
+        f.write(text)
+    PROFILER.add(files=1, bytes_written=len(text))
+
+
+class TextWriter():
+    def __init__(self, directory, fmt=TEXT_FORMAT):
+        self.directory = directory
+        self.fmt = fmt
+
+    def write(self, filename, header, data, xscale):
+        write_text(os.path.join(self.directory, filename+'.txt'), np.hstack([data, (xscale)]), self.fmt)
+
+    def close(self):
+        pass
+
+
+class BundleWriter():
+    '''
+    Collects every scan and saves them in one .npz file on close: spectra
+    (scans x bins x channels), xscale (scans x bins), headers and
+    filenames. With resume, the scans already saved in the file are kept
+    and the new ones added after them (e.g. by watch mode).
+    '''
+
+    def __init__(self, filepath, resume=False):
+        self.filepath = filepath
+        self.spectra = []
+        self.headers = []
+        self.filenames = []
+        self.xscales = []
+        if resume and os.path.exists(filepath):
+            with np.load(filepath) as bundle:
+                self.spectra = list(bundle['spectra'])
+                xscale = bundle['xscale']
+                # Bundles of earlier versions hold one x-axis for every scan
+                self.xscales = list(xscale) if xscale.ndim == 2 else [xscale.ravel()]*len(self.spectra)
+                self.headers = [str(h) for h in bundle['headers']]
+                self.filenames = [str(f) for f in bundle['filenames']]
+
+    def write(self, filename, header, data, xscale):
+        self.spectra.append(np.asarray(data, dtype=np.float64))
+        self.headers.append(str(header[0]) if len(header) else '')
+        self.filenames.append(filename)
+        self.xscales.append(np.asarray(xscale, dtype=np.float64).ravel())
+
+    def close(self):
+        if not self.spectra:
+            return
+        np.savez_compressed(self.filepath, spectra=np.stack(self.spectra),
+                            xscale=np.stack(self.xscales),
+                            headers=np.array(self.headers), filenames=np.array(self.filenames))
+        PROFILER.add_file(self.filepath)
+
+
+class AppendWriter():
+    '''
+    Appends each scan to filepath.f64 as raw float64 values, its data
+    columns followed by its x-axis (as in the text output), and a line of
+    JSON with its header and filename to filepath.jsonl, whose first line
+    holds the shape of the data. Both are appended to as scans are
+    written, so they can be read while a night is running. With resume,
+    scans already in the files are kept (e.g. by watch mode).
+    '''
+
+    def __init__(self, filepath, resume=False):
+        self.datapath = filepath+'.f64'
+        self.indexpath = filepath+'.jsonl'
+        self.shape = None
+        if resume and os.path.exists(self.indexpath) and os.path.exists(self.datapath):
+            meta, length = read_index(self.indexpath)
+            self.shape = meta['shape']
+            # Drop any partly written scan or index line left by an interrupted run
+            with open(self.indexpath, 'r+b') as f:
+                f.truncate(length)
+            if self.shape is not None:
+                with open(self.datapath, 'r+b') as f:
+                    f.truncate(len(meta['filenames'])*self.shape[0]*(self.shape[1]+1)*8)
+        else:
+            # filepath.json is the metadata file of earlier versions
+            for path in (self.datapath, self.indexpath, filepath+'.json'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def write(self, filename, header, data, xscale):
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        if self.shape is None:
+            self.shape = list(data.shape)
+            self.append_line({'shape': self.shape})
+        elif list(data.shape) != self.shape:
+            raise ValueError('Scan has shape '+str(data.shape)+', expected '+str(tuple(self.shape)))
+        scan = np.hstack([data, np.asarray(xscale, dtype=np.float64).reshape(-1, 1)])
+        with open(self.datapath, 'ab') as f:
+            f.write(scan.tobytes())
+        PROFILER.add(bytes_written=scan.nbytes)
+        # The index line is added once the scan is complete
+        self.append_line({'header': str(header[0]) if len(header) else '', 'filename': filename})
+
+    def append_line(self, entry):
+        with open(self.indexpath, 'a') as f:
+            f.write(json.dumps(entry)+'\n')
+
+    def close(self):
+        pass
+
+
+def read_index(indexpath):
+    '''
+    Metadata (shape, headers and filenames) of the scans in an
+    AppendWriter index, and the length in bytes of its complete lines.
+    '''
+    meta = {'shape': None, 'headers': [], 'filenames': []}
+    length = 0
+    with open(indexpath, 'rb') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                break
+            if 'shape' in entry:
+                meta['shape'] = entry['shape']
+            else:
+                meta['headers'].append(entry['header'])
+                meta['filenames'].append(entry['filename'])
+            length += len(line)
+    return meta, length
+
+
+def load_appended(filepath):
+    '''
+    Memory-map the scans written by AppendWriter, returning (spectra, meta)
+    with spectra (scans x bins x channels) and meta['xscale'] the x-axis of
+    each scan (scans x bins).
+    '''
+    meta = read_index(filepath+'.jsonl')[0]
+    bins, channels = meta['shape']
+    scans = np.memmap(filepath+'.f64', dtype=np.float64, mode='r', shape=(len(meta['filenames']), bins, channels+1))
+    meta['xscale'] = scans[:, :, channels]
+    return scans[:, :, :channels], meta
+
+
+def open_writers(outputs, directory, fmt=TEXT_FORMAT, resume=False):
+    '''
+    Writers for the comma-separated output kinds (txt, npz, bin) in outputs.
+    '''
+    writers = []
+    for kind in [k.strip() for k in outputs.split(',') if k.strip()]:
+        if kind == 'txt':
+            writers.append(TextWriter(directory, fmt))
+        elif kind == 'npz':
+            writers.append(BundleWriter(os.path.join(directory, BUNDLE_NAME+'.npz'), resume))
+        elif kind == 'bin':
+            writers.append(AppendWriter(os.path.join(directory, BUNDLE_NAME), resume))
+        else:
+            raise ValueError('Unknown output '+repr(kind)+' (expected txt, npz or bin)')
+    return writers
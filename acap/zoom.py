@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Frequency windows of the enlarged single spectrum mode.
+
+Windows are given in kHz and turned into data point ranges of the scans
+already loaded for the main frequency range, so every zoom is a slice view
+of the loaded data rather than a second read of the files.
+"""
+
+import numpy as np
+
+
+def parse_limits(text):
+    '''
+    Comma-separated numbers, e.g. '-1600, 200' -> [-1600.0, 200.0].
+    '''
+    return [float(x) for x in str(text).split(',') if x.strip()]
+
+
+def format_limit(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+class ZoomWindow():
+    '''
+    Frequency window lower to upper (kHz) and its data points start:stop
+    within scans covering f_lower upwards in steps of f_step.
+    '''
+
+    def __init__(self, lower, upper, f_lower, f_step, num_bins):
+        if upper <= lower:
+            raise ValueError('Window '+format_limit(lower)+' to '+format_limit(upper)+' kHz is empty')
+        self.lower = lower
+        self.upper = upper
+        self.start = int(np.clip(np.ceil((lower - f_lower)/f_step), 0, num_bins))
+        self.stop = int(np.clip(np.ceil((upper - f_lower)/f_step), 0, num_bins))
+        if self.stop <= self.start:
+            raise ValueError('Window '+self.label+' is outside the scanned range')
+
+    @property
+    def label(self):
+        return format_limit(self.lower)+' to '+format_limit(self.upper)+' kHz'
+
+    @property
+    def slice(self):
+        return slice(self.start, self.stop)
+
+
+def zoom_windows(lowers, uppers, f_lower, f_step, num_bins):
+    '''
+    ZoomWindows for the comma-separated lower and upper limits, paired in order.
+    '''
+    lowers = parse_limits(lowers)
+    uppers = parse_limits(uppers)
+    if len(lowers) != len(uppers) or not lowers:
+        raise ValueError('Expected the same number of lower and upper limits, got '
+                         +str(len(lowers))+' and '+str(len(uppers)))
+    return [ZoomWindow(lower, upper, f_lower, f_step, num_bins) for lower, upper in zip(lowers, uppers)]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the data quality flags (acap/flags.py).
+"""
+
+import numpy as np
+import pytest
+
+from acap.flags import flag_scans, ScanFlagger
+
+BINS = 399
+BASELINE = 2.0  # Volts
+NOISE = 0.1
+
+
+def noisy_scan(seed, channels=2):
+    rng = np.random.default_rng(seed)
+    return BASELINE + NOISE*rng.standard_normal((BINS, channels))
+
+
+@pytest.mark.parametrize('sigma', [1.0, 1.25, 1.5])
+@pytest.mark.parametrize('amplitude', [1.0, 2.0, 3.0])
+def test_narrow_line_is_kept(sigma, amplitude):
+    bins = np.arange(BINS)
+    for seed in range(20):
+        data = noisy_scan(seed)
+        centre = 150 + seed
+        data += (amplitude*np.exp(-0.5*((bins-centre)/sigma)**2))[:, np.newaxis]
+        saturated, rfi = flag_scans(data)
+        assert not saturated.any()
+        assert not rfi[centre-5:centre+6].any()
+
+
+def test_single_bin_spike_is_flagged():
+    data = noisy_scan(0)
+    data[200, 0] += 2.0
+    data[300, 1] -= 1.5
+    saturated, rfi = flag_scans(data)
+    assert rfi[200, 0] and rfi[300, 1]
+    assert np.count_nonzero(rfi) == 2
+
+
+def test_saturated_points_are_flagged():
+    data = noisy_scan(1)
+    data[10:14, 0] = 10.0
+    data[50, 1] = 0.0
+    flagger = ScanFlagger()
+    mask = flagger.flag(data)
+    assert mask[10:14, 0].all() and mask[50, 1]
+    assert flagger.summary()['saturated'] == 5
+
+
+def test_only_window_is_checked():
+    data = noisy_scan(2)
+    data[5, 0] += 2.0
+    saturated, rfi = flag_scans(data, 20, 380)
+    assert not rfi[5, 0]
+
+
+def test_flagging_is_off_by_default():
+    from acap.console import run_settings
+    assert run_settings({})['flags'] is False
+    assert run_settings({'flags': True})['flags'] is True
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the Gaussian line measurements (acap/lines.py).
+"""
+
+import numpy as np
+import pytest
+
+from acap.lines import measure_lines, fit_gaussians, FWHM_PER_SIGMA
+
+SCANS = 50
+
+
+def known_lines(noise, seed=1):
+    rng = np.random.default_rng(seed)
+    x = np.arange(400)*0.25 - 50
+    centres = rng.uniform(-20, 20, SCANS)
+    y = 3*np.exp(-0.5*((x - centres[:, np.newaxis])/1.2)**2) + noise*rng.standard_normal((SCANS, len(x)))
+    return x, centres, y
+
+
+@pytest.mark.parametrize('noise', [0.05, 1e-3, 0])
+def test_known_lines_converge(noise):
+    x, centres, y = known_lines(noise)
+    fits = measure_lines(y[:, :, np.newaxis], np.repeat(x[np.newaxis], SCANS, axis=0))
+    assert fits['converged'].all()
+    assert np.abs(fits['centre'][:, 0] - centres).max() < 0.1
+    assert np.abs(fits['fwhm'][:, 0] - 1.2*FWHM_PER_SIGMA).max() < 0.1
+    assert np.abs(fits['amplitude'][:, 0] - 3).max() < 0.1
+
+
+def test_empty_window_is_not_converged():
+    params, rms, converged = fit_gaussians(np.arange(41.0)[np.newaxis], np.full((1, 41), np.nan))
+    assert not converged[0]
+    assert np.isnan(params).all()